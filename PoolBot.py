@@ -3,15 +3,25 @@ from __future__ import print_function
 import os
 
 import discord
+import hashlib
+import io
+import json
 import re
 import random
+import sqlite3
 import ssl
+import threading
 import time
 from dotenv import load_dotenv
-from typing import Optional, Sequence, Union, List, TypedDict, Tuple, Any
-from datetime import datetime
-from collections import Counter, defaultdict
-from asyncio import Lock, sleep
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Generic, Hashable, Iterable, Iterator, Optional, Sequence, Union, List, TypedDict, Tuple, TypeVar, Any
+from datetime import datetime, timezone
+from collections import Counter, OrderedDict, defaultdict, deque
+from asyncio import Event, Future, Lock, Queue, Semaphore, Task, TimerHandle, create_task, gather, sleep, get_running_loop, wait_for
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor
+from math import inf
 
 import os.path
 
@@ -20,13 +30,63 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from google_auth_httplib2 import AuthorizedHttp
 
 import aiohttp
+from aiohttp import web
+import httplib2
+import numpy as np
+import numpy.typing as npt
 import utils
 
 load_dotenv()
 
 SEALEDDECK_URL = "https://sealeddeck.tech/api/pools"
+SEALEDDECK_MAX_CONNECTIONS = 8
+SEALEDDECK_TIMEOUT = 30
+SEALEDDECK_ATTEMPTS = 3
+SEALEDDECK_FETCH_CONCURRENCY = 8
+SHEETS_MAX_WORKERS = 4
+SHEET_FLUSH_INTERVAL = 1.0
+SHEET_FLUSH_MAX_PENDING = 50
+POOL_CACHE_PATH = "pool_cache.sqlite3"
+POOL_CACHE_MAX_BYTES = 32 * 1024 * 1024
+POOL_ID_RECONCILE_INTERVAL = 600
+POOL_STORE_PATH = "pool_store.sqlite3"
+POOL_STORE_SNAPSHOT_EVERY = 20
+POOL_STORE_RETRY_DELAY = 30
+# Cards listed when a pool rebuilt by !pool link differs from the latest one
+POOL_DIFF_LINES = 30
+PACK_OPTIONS_PATH = "pack_options.json"
+PACK_OPTIONS_MIGRATION_LIMIT = 500
+ADD_PACK_MAX_MESSAGES = 30
+ADD_PACK_HISTORY_LIMIT = 500
+BOOSTER_RESPONSE_TIMEOUT = 120
+LFM_TIMEOUT = 2 * 60 * 60
+LFM_PAIRING = "oldest"
+BROADCAST_RATE = 2.0
+BROADCAST_BURST = 5
+BROADCAST_CONCURRENCY = 4
+BROADCAST_MAX_ATTEMPTS = 5
+BROADCAST_JOURNAL_DIR = "broadcasts"
+PLAYER_DIRECTORY_TTL = 300
+POOLS_INDEX_TTL = 300
+POOL_TRACKER_CONCURRENCY = 8
+PACK_PIPELINE_QUEUE_SIZE = 100
+PACK_PIPELINE_WORKERS = {"owner": 4, "pool": POOL_TRACKER_CONCURRENCY, "sealeddeck": 8, "write": 4}
+TOKEN_PATH = "token.json"
+TOKEN_REFRESH_MARGIN = 600
+TOKEN_REFRESH_RETRY = 30
+RETRY_QUEUE_PATH = "pack_retries.sqlite3"
+RETRY_MAX_ATTEMPTS = 8
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 1800
+RETRY_DRAIN_RATE = 1.0
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNTED_COMMANDS = {
+    "!playerchoice", "!addpack", "!randint", "!challenge", "!help", "!stats", "!lfm", "!retractlfm", "!nvm",
+    "!choosepacka", "!chooseurza", "!choosepackb", "!choosemishra", "!pool",
+}
 
 
 class PoolBotError(Exception):
@@ -44,6 +104,136 @@ class SpreadsheetError(PoolBotError):
     pass
 
 
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Histogram:
+    """Counts of observations per bucket, where each bucket holds values up to its bound, as in Prometheus."""
+    def __init__(self, buckets: Sequence[float] = METRIC_BUCKETS):
+        self.buckets = buckets
+        # The last count is for values above every bound
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket the `q` quantile falls in."""
+        cumulative = 0
+        for bound, count in zip((*self.buckets, inf), self.counts):
+            cumulative += count
+            if cumulative >= q * self.count:
+                return bound
+        return inf
+
+
+class Metrics:
+    """
+    Counters, gauges and latency histograms for the bot's hot paths, each identified by a name and labels. `render`
+    produces the Prometheus text format served by the metrics server, and `summary` the text for !stats.
+    """
+    def __init__(self):
+        self.counters: dict[MetricKey, float] = defaultdict(float)
+        self.gauges: dict[MetricKey, float] = {}
+        self.histograms: dict[MetricKey, Histogram] = {}
+        self.started = time.time()
+
+    @staticmethod
+    def _key(name: str, labels: dict[str, str]) -> MetricKey:
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        self.counters[self._key(name, labels)] += amount
+
+    def set(self, name: str, value: float, **labels: str):
+        self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name: str, seconds: float, **labels: str):
+        key = self._key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        """Observe how long the block takes, whether or not it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    @staticmethod
+    def _labels(labels: Iterable[Tuple[str, str]]) -> str:
+        def escape(value: str) -> str:
+            return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        text = ",".join(f'{name}="{escape(value)}"' for name, value in labels)
+        return f"{{{text}}}" if text else ""
+
+    def render(self) -> str:
+        lines: list[str] = []
+        typed: set[str] = set()
+
+        def declare(name: str, kind: str):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+            for (name, labels), value in sorted(values.items()):
+                declare(name, kind)
+                lines.append(f"{name}{self._labels(labels)} {value}")
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            declare(name, "histogram")
+            cumulative = 0
+            for bound, count in zip((*histogram.buckets, inf), histogram.counts):
+                cumulative += count
+                le = "+Inf" if bound == inf else str(bound)
+                lines.append(f"{name}_bucket{self._labels((*labels, ('le', le)))} {cumulative}")
+            lines.append(f"{name}_sum{self._labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{self._labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        lines = [f"Up for {int(time.time() - self.started)}s"]
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            mean = histogram.sum / histogram.count * 1000 if histogram.count else 0
+            lines.append(
+                f"{name}{self._labels(labels)}: {histogram.count} calls, mean {mean:.0f}ms, "
+                f"p50 ≤{histogram.quantile(0.5) * 1000:.0f}ms, p95 ≤{histogram.quantile(0.95) * 1000:.0f}ms"
+            )
+        for (name, labels), value in sorted(self.counters.items()):
+            lines.append(f"{name}{self._labels(labels)}: {value:g}")
+        for (name, labels), value in sorted(self.gauges.items()):
+            lines.append(f"{name}{self._labels(labels)}: {value:.3f}")
+        return "\n".join(lines)
+
+
+# Shared by everything in the bot, like a Prometheus client's default registry
+metrics = Metrics()
+
+
+async def start_metrics_server(registry: Metrics, port: int) -> web.AppRunner:
+    """Serve `registry` in Prometheus text format at http://127.0.0.1:<port>/metrics."""
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+# A link to a message in a server channel: https://discord.com/channels/<guild>/<channel>/<message>
+DISCORD_MESSAGE_LINK = re.compile(r"https?://(?:\w+\.)?discord(?:app)?\.com/channels/\d+/(\d+)/(\d+)")
+
 def parse_sealeddeck_url(content: str) -> Optional[str]:
     """Extract sealeddeck ID from message content. Returns None if not found."""
     match = re.search(r"https?://(?:www\.)?sealeddeck\.tech/([^/\s]+)", content)
@@ -153,37 +343,266 @@ def parse_pool_row(row: list[str]) -> Optional[PoolRow]:
     return pool_row
 
 
+# A card line in an Arena export: a count (optionally written "2x"), the card name, then optionally its set code and
+# collector number, e.g. "2 Lightning Bolt (M10) 146"
+ARENA_LINE = re.compile(r"(\d+)x?\s+(.*?\S)(?:\s+\([A-Za-z0-9]+\)(?:\s+\S+)?)?")
+# Lines that start a section of an Arena export rather than naming a card
+ARENA_SECTIONS = frozenset(("deck", "sideboard", "commander", "companion", "maybeboard", "about"))
+
+@dataclass
+class ArenaLineError:
+    line_number: int
+    line: str
+    reason: str
+
+@dataclass
+class ArenaList:
+    # One entry per card name, in the order each first appears
+    cards: List[SealedDeckEntry]
+    errors: List[ArenaLineError]
+
+def _arena_skipped(line: str) -> bool:
+    return not line or line.lower() in ARENA_SECTIONS or line.startswith(("Name ", "//", "#"))
+
+def parse_arena_list(arena_list: Union[str, Iterable[str]]) -> ArenaList:
+    """
+    Parse an Arena export, given as text or as lines (e.g. an open file), merging entries for the same card. Printings
+    aren't distinguished, so copies from different sets are merged too. Blank lines, section headers and the deck's
+    name are skipped, and every other line that isn't a card is reported with its line number, starting at 1.
+    """
+    lines = arena_list.splitlines() if isinstance(arena_list, str) else arena_list
+    counts: dict[str, int] = {}
+    errors: List[ArenaLineError] = []
+    fullmatch = ARENA_LINE.fullmatch
+    # This is run on whole cube exports. Most lines are cards with nothing around them, so they're matched as they are
+    # before anything else is tried.
+    for line_number, line in enumerate(lines, start=1):
+        match = fullmatch(line)
+        if match is None:
+            line = line.strip()
+            if _arena_skipped(line):
+                continue
+            match = fullmatch(line)
+            if match is None:
+                errors.append(ArenaLineError(line_number, line, "expected a count followed by a card name"))
+                continue
+        count = int(match[1])
+        if count == 0:
+            errors.append(ArenaLineError(line_number, line.strip(), "count must be at least 1"))
+            continue
+        name = match[2]
+        counts[name] = counts.get(name, 0) + count
+    return ArenaList([{"name": name, "count": count} for name, count in counts.items()], errors)
+
 def arena_to_json(arena_list: str) -> Sequence[SealedDeckEntry]:
-    """Convert a list of cards in arena format to a list of json cards"""
-    json_list: List[SealedDeckEntry] = []
-    for line in arena_list.rstrip("\n ").split("\n"):
-        count, card = line.split(" ", 1)
-        card_name = card.split(" (")[0]
-        json_list.append({"name": f"{card_name}", "count": int(count)})
-    return json_list
+    """Convert a list of cards in arena format to a list of json cards. Lines that aren't cards are logged and skipped."""
+    parsed = parse_arena_list(arena_list)
+    for error in parsed.errors:
+        print(f"arena list error — line {error.line_number} {error.line!r}: {error.reason}")
+    return parsed.cards
+
+class CardIndex:
+    """Interns card names to small integer IDs, in the order they're first seen. IDs are never reused."""
+    def __init__(self):
+        self.names: list[str] = []
+        self._ids: dict[str, int] = {}
+
+    def intern(self, name: str) -> int:
+        card_id = self._ids.get(name)
+        if card_id is None:
+            card_id = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return card_id
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+# Shared by every CompactPool, so pools can be combined without translating IDs
+CARD_INDEX = CardIndex()
+
+class CompactPool:
+    """
+    Card counts as a vector indexed by interned card ID. A pool's vector only reaches the highest ID it has seen, and
+    is padded with zeros when combined with a longer one. Counts may go negative part way through applying a change
+    history, but only positive counts are part of the pool when it's converted back to entries.
+    """
+    __slots__ = ("counts", "index")
+
+    def __init__(self, counts: Optional[npt.NDArray[np.int32]] = None, index: CardIndex = CARD_INDEX):
+        self.counts: npt.NDArray[np.int32] = counts if counts is not None else np.zeros(0, dtype=np.int32)
+        self.index = index
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[SealedDeckEntry], index: CardIndex = CARD_INDEX) -> "CompactPool":
+        """Duplicate entries for the same card are summed."""
+        entries = list(entries)
+        ids = np.fromiter((index.intern(card["name"]) for card in entries), dtype=np.intp, count=len(entries))
+        counts = np.zeros(len(index), dtype=np.int32)
+        np.add.at(counts, ids, np.fromiter((card["count"] for card in entries), dtype=np.int32, count=len(entries)))
+        return cls(counts, index)
+
+    @classmethod
+    def from_counts(cls, counts: dict[str, int], index: CardIndex = CARD_INDEX) -> "CompactPool":
+        return cls.from_entries(({"name": name, "count": count} for name, count in counts.items()), index)
+
+    def to_entries(self) -> List[SealedDeckEntry]:
+        """The cards with a positive count, in interning order."""
+        names = self.index.names
+        return [{"name": names[card_id], "count": int(self.counts[card_id])} for card_id in np.flatnonzero(self.counts > 0)]
+
+    def to_counts(self) -> dict[str, int]:
+        """Every nonzero count, negative ones included."""
+        names = self.index.names
+        return {names[card_id]: int(self.counts[card_id]) for card_id in np.flatnonzero(self.counts)}
+
+    def _padded(self, size: int) -> npt.NDArray[np.int32]:
+        if len(self.counts) >= size:
+            return self.counts
+        return np.concatenate((self.counts, np.zeros(size - len(self.counts), dtype=np.int32)))
+
+    def _aligned(self, other: "CompactPool") -> Tuple[npt.NDArray[np.int32], npt.NDArray[np.int32]]:
+        size = max(len(self.counts), len(other.counts))
+        return self._padded(size), other._padded(size)
+
+    def __add__(self, other: "CompactPool") -> "CompactPool":
+        ours, theirs = self._aligned(other)
+        return CompactPool(ours + theirs, self.index)
+
+    def __sub__(self, other: "CompactPool") -> "CompactPool":
+        ours, theirs = self._aligned(other)
+        return CompactPool(ours - theirs, self.index)
+
+    def __mul__(self, factor: int) -> "CompactPool":
+        return CompactPool(self.counts * np.int32(factor), self.index)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, CompactPool):
+            return NotImplemented
+        ours, theirs = self._aligned(other)
+        return bool(np.array_equal(ours, theirs))
+
+    def add(self, other: "CompactPool", factor: int = 1):
+        """Add `other` times `factor` to this pool in place."""
+        self.counts = self._padded(len(other.counts))
+        self.counts[:len(other.counts)] += other.counts * np.int32(factor)
+
+    def add_card(self, name: str, count: int = 1):
+        card_id = self.index.intern(name)
+        self.counts = self._padded(card_id + 1)
+        self.counts[card_id] += count
+
+    def diff(self, other: "CompactPool") -> Tuple["CompactPool", "CompactPool"]:
+        """Cards this pool has more of than `other`, and cards `other` has more of than this pool."""
+        ours, theirs = self._aligned(other)
+        return (
+            CompactPool(np.maximum(ours - theirs, 0), self.index),
+            CompactPool(np.maximum(theirs - ours, 0), self.index),
+        )
+
+    def total(self) -> int:
+        return int(self.counts[self.counts > 0].sum())
+
+    @staticmethod
+    def aggregate(pools: Iterable["CompactPool"], index: CardIndex = CARD_INDEX) -> "CompactPool":
+        """Every pool's cards summed together, e.g. the copies of each card across a whole league."""
+        pools = list(pools)
+        matrix = np.zeros((len(pools), len(index)), dtype=np.int32)
+        for row, pool in zip(matrix, pools):
+            row[:len(pool.counts)] = pool.counts
+        return CompactPool(np.maximum(matrix, 0).sum(axis=0, dtype=np.int32), index)
 
 def remove_cards(pool: Sequence[SealedDeckEntry], cards_to_remove: Sequence[SealedDeckEntry]) -> Sequence[SealedDeckEntry]:
     """Remove the given cards from the pool, decrementing counts or totally removing entries."""
-    counted: Counter[str] = Counter()
-    for card in pool:
-        counted[card["name"]] += card["count"]
-    for card in cards_to_remove:
-        counted[card["name"]] -= card["count"]
-    return [{"name": name, "count": count} for name, count in counted.items() if count > 0]
-
-async def sealeddeck_pool(pool_sealeddeck_id: str) -> Sequence[SealedDeckEntry]:
-    """Fetch pool data from sealeddeck.tech. Raises SealedDeckError on failure."""
+    return (CompactPool.from_entries(pool) - CompactPool.from_entries(cards_to_remove)).to_entries()
+
+class PoolCache:
+    """
+    Two-tier cache of sealeddeck.tech pool contents keyed by pool ID. A pool ID always points at the same contents, so
+    entries never go stale. An in-memory LRU bounded by serialized size sits in front of a sqlite table on disk that
+    survives restarts. Lookups are counted in `poolbot_pool_cache_total`, by which tier answered them.
+    """
+    def __init__(self, path: str = POOL_CACHE_PATH, max_bytes: int = POOL_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._memory: OrderedDict[str, Tuple[Sequence[SealedDeckEntry], int]] = OrderedDict()
+        self._memory_bytes = 0
+        self._db = sqlite3.connect(path)
+        self._db.execute("CREATE TABLE IF NOT EXISTS pools (pool_id TEXT PRIMARY KEY, contents TEXT NOT NULL)")
+        self._db.commit()
+
+    def get(self, pool_id: str) -> Optional[Sequence[SealedDeckEntry]]:
+        entry = self._memory.get(pool_id)
+        if entry is not None:
+            self._memory.move_to_end(pool_id)
+            metrics.inc("poolbot_pool_cache_total", result="memory_hit")
+            return entry[0]
+        row = self._db.execute("SELECT contents FROM pools WHERE pool_id = ?", (pool_id,)).fetchone()
+        if row is None:
+            metrics.inc("poolbot_pool_cache_total", result="miss")
+            return None
+        metrics.inc("poolbot_pool_cache_total", result="disk_hit")
+        pool = json.loads(row[0])
+        self._remember(pool_id, pool, len(row[0]))
+        return pool
+
+    def put(self, pool_id: str, pool: Sequence[SealedDeckEntry]):
+        contents = json.dumps(pool)
+        self._db.execute("INSERT OR REPLACE INTO pools (pool_id, contents) VALUES (?, ?)", (pool_id, contents))
+        self._db.commit()
+        self._remember(pool_id, pool, len(contents))
+
+    def _remember(self, pool_id: str, pool: Sequence[SealedDeckEntry], size: int):
+        previous = self._memory.pop(pool_id, None)
+        if previous is not None:
+            self._memory_bytes -= previous[1]
+        self._memory[pool_id] = (pool, size)
+        self._memory_bytes += size
+        # Evict least recently used pools, but always keep the one just added
+        while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+        metrics.set("poolbot_pool_cache_memory_bytes", self._memory_bytes)
+        metrics.set("poolbot_pool_cache_memory_entries", len(self._memory))
+
+    def close(self):
+        self._db.close()
+
+def new_sealeddeck_session(max_connections: int = SEALEDDECK_MAX_CONNECTIONS) -> aiohttp.ClientSession:
+    """Create the long-lived session used for all sealeddeck.tech requests. Must be called from a running event loop."""
+    connector = aiohttp.TCPConnector(limit=max_connections, limit_per_host=max_connections, keepalive_timeout=60)
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=SEALEDDECK_TIMEOUT))
+
+def is_retryable(err: Exception) -> bool:
+    """Client errors other than rate limiting won't succeed on a retry, everything else might."""
+    if isinstance(err, aiohttp.ClientResponseError):
+        return err.status == 429 or err.status >= 500
+    return True
+
+async def backoff(attempt: int, base: float = 0.5, cap: float = 10.0):
+    """Sleep before retrying, using exponential backoff with full jitter. `attempt` is 0 for the first retry."""
+    await sleep(random.uniform(0, min(cap, base * 2 ** attempt)))
+
+async def sealeddeck_pool(
+        session: aiohttp.ClientSession, pool_sealeddeck_id: str, cache: Optional[PoolCache] = None
+) -> Sequence[SealedDeckEntry]:
+    """Fetch pool data from sealeddeck.tech, or from the cache if given. Raises SealedDeckError on failure."""
+    if cache is not None:
+        cached = cache.get(pool_sealeddeck_id)
+        if cached is not None:
+            return cached
+
     resp_json = None
 
-    for attempt in range(3):
+    for attempt in range(SEALEDDECK_ATTEMPTS):
         try:
-            async with aiohttp.ClientSession() as session:
+            with metrics.timer("poolbot_sealeddeck_request_seconds", operation="get"):
                 async with session.get(f"{SEALEDDECK_URL}/{pool_sealeddeck_id}") as resp:
                     resp.raise_for_status()
                     resp_json = await resp.json()
         except Exception as e:
-            if attempt == 2:
-                raise SealedDeckError(f"Failed to fetch pool {pool_sealeddeck_id} after 3 attempts: {e}")
+            if attempt == SEALEDDECK_ATTEMPTS - 1 or not is_retryable(e):
+                raise SealedDeckError(f"Failed to fetch pool {pool_sealeddeck_id} after {attempt + 1} attempts: {e}")
+            metrics.inc("poolbot_retries_total", operation="sealeddeck_pool")
+            await backoff(attempt)
             continue
         else:
             break
@@ -191,25 +610,30 @@ async def sealeddeck_pool(pool_sealeddeck_id: str) -> Sequence[SealedDeckEntry]:
     if resp_json is None:
         raise SealedDeckError(f"Received null response for pool {pool_sealeddeck_id}")
 
-    return [*resp_json["sideboard"], *resp_json["deck"], *resp_json["hidden"]]
+    pool: Sequence[SealedDeckEntry] = [*resp_json["sideboard"], *resp_json["deck"], *resp_json["hidden"]]
+    if cache is not None:
+        cache.put(pool_sealeddeck_id, pool)
+    return pool
 
 async def pool_to_sealeddeck(
-        punishment_cards: Sequence[SealedDeckEntry], pool_sealeddeck_id: Optional[str] = None
+        session: aiohttp.ClientSession, punishment_cards: Sequence[SealedDeckEntry], pool_sealeddeck_id: Optional[str] = None
 ) -> str:
     """Adds punishment cards to a sealeddeck.tech pool and returns the id. Raises SealedDeckError on failure."""
     deck: dict[str, Union[Sequence[SealedDeckEntry], str]] = {"sideboard": punishment_cards}
     if pool_sealeddeck_id:
         deck["poolId"] = pool_sealeddeck_id
 
-    for attempt in range(3):
+    for attempt in range(SEALEDDECK_ATTEMPTS):
         try:
-            async with aiohttp.ClientSession() as session:
+            with metrics.timer("poolbot_sealeddeck_request_seconds", operation="create"):
                 async with session.post(SEALEDDECK_URL, json=deck) as resp:
                     resp.raise_for_status()
                     resp_json = await resp.json()
         except Exception as e:
-            if attempt == 2:
-                raise SealedDeckError(f"Failed to create pool after 3 attempts: {e}")
+            if attempt == SEALEDDECK_ATTEMPTS - 1 or not is_retryable(e):
+                raise SealedDeckError(f"Failed to create pool after {attempt + 1} attempts: {e}")
+            metrics.inc("poolbot_retries_total", operation="pool_to_sealeddeck")
+            await backoff(attempt)
             continue
         else:
             break
@@ -217,6 +641,14 @@ async def pool_to_sealeddeck(
     return str(resp_json["poolId"])
 
 
+def write_file_atomically(path: str, content: str):
+    """Replace a file's contents so readers (and crashes) only ever see the old or the new version."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        file.write(content)
+    os.replace(tmp_path, path)
+
+
 async def update_message(message: discord.Message, new_content: str) -> Optional[discord.Message]:
     """Updates the text contents of a sent bot message. Returns None on failure."""
     try:
@@ -230,22 +662,252 @@ async def update_message(message: discord.Message, new_content: str) -> Optional
         return None
 
 
-async def message_member(member: Union[discord.Member, discord.User], message: str):
-    try:
-        await member.send(message)
-        # await member.send(
-        #     "Greetings, current or former Arena Gauntlet League player! This is your last chance to join us for the Wilds of Eldraine league before registration closes on Wednesday, September 6th at 5pm EST.\n\nSign up here: https://docs.google.com/forms/d/e/1FAIpQLSe44aHmif2QsplYoxdyKDmrpj6hRhywdPLQD4SYhOvhvjfsGA/viewform.\n\nWe hope to see you there!")
-        time.sleep(0.25)
-    except discord.errors.Forbidden as e:
-        print(e)
-
-async def get_sheet_client() -> Any:
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, in bursts of up to `capacity`."""
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def pause(self, seconds: float):
+        """Hold back every waiter for at least `seconds`, e.g. when told to retry after a rate limit."""
+        self._refill()
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class BroadcastJournal:
+    """
+    Append-only record of what happened to each recipient of a broadcast. Re-running an interrupted broadcast with
+    the same journal skips everyone it already reached.
+    """
+    # Statuses that shouldn't be retried
+    FINAL = ("sent", "forbidden")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.statuses: dict[int, str] = {}
+        if os.path.exists(path):
+            with open(path) as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.statuses[entry["id"]] = entry["status"]
+        self._file = open(path, "a")
+
+    @staticmethod
+    def path_for(directory: str, *key: str) -> str:
+        """The journal path for a broadcast, identified by e.g. its audience and content."""
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256("\0".join(key).encode()).hexdigest()[:16]
+        return os.path.join(directory, f"{digest}.jsonl")
+
+    def is_done(self, member_id: int) -> bool:
+        return self.statuses.get(member_id) in self.FINAL
+
+    def record(self, member_id: int, status: str):
+        self.statuses[member_id] = status
+        self._file.write(json.dumps({"id": member_id, "status": status, "at": datetime.now().isoformat()}) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+async def message_member(member: Union[discord.Member, discord.User], message: str, bucket: Optional[TokenBucket] = None) -> str:
+    """DM a member, waiting out rate limits. Returns "sent", "forbidden" if they don't accept DMs, or "failed"."""
+    for attempt in range(BROADCAST_MAX_ATTEMPTS):
+        if bucket is not None:
+            await bucket.acquire()
+        try:
+            await member.send(message)
+            # await member.send(
+            #     "Greetings, current or former Arena Gauntlet League player! This is your last chance to join us for the Wilds of Eldraine league before registration closes on Wednesday, September 6th at 5pm EST.\n\nSign up here: https://docs.google.com/forms/d/e/1FAIpQLSe44aHmif2QsplYoxdyKDmrpj6hRhywdPLQD4SYhOvhvjfsGA/viewform.\n\nWe hope to see you there!")
+            return "sent"
+        except discord.errors.Forbidden as e:
+            print(e)
+            return "forbidden"
+        except discord.errors.HTTPException as e:
+            if e.status != 429 or attempt == BROADCAST_MAX_ATTEMPTS - 1:
+                print(f"Could not DM {member}: {e}")
+                return "failed"
+            retry_after = float(e.response.headers.get("Retry-After", 1))
+            print(f"Rate limited DMing {member}, retrying in {retry_after}s")
+            if bucket is not None:
+                bucket.pause(retry_after)
+            else:
+                await sleep(retry_after)
+    return "failed"
+
+
+async def broadcast(
+        recipients: Sequence[Union[discord.Member, discord.User]],
+        message: str,
+        bucket: TokenBucket,
+        concurrency: int = BROADCAST_CONCURRENCY,
+        journal: Optional[BroadcastJournal] = None,
+) -> list[Tuple[Union[discord.Member, discord.User], str]]:
+    """
+    DM every recipient, at most `concurrency` at a time and no faster than `bucket` allows. Recipients the journal
+    says were already reached are skipped. Returns each recipient's status, with "skipped" for the skipped ones.
+    """
+    semaphore = Semaphore(concurrency)
+
+    async def send(member: Union[discord.Member, discord.User]) -> str:
+        if journal is not None and journal.is_done(member.id):
+            return "skipped"
+        async with semaphore:
+            status = await message_member(member, message, bucket)
+        if journal is not None:
+            journal.record(member.id, status)
+        return status
+
+    statuses = await gather(*(send(member) for member in recipients))
+    return list(zip(recipients, statuses))
+
+
+def broadcast_report(results: Sequence[Tuple[Union[discord.Member, discord.User], str]]) -> Tuple[str, discord.File]:
+    """Summarize a broadcast for the sender, with every recipient's status attached as a CSV."""
+    counts = Counter(status for _, status in results)
+    summary = f'Successfully DMed {counts["sent"]} user(s).'
+    others = ", ".join(f"{count} {status}" for status, count in counts.items() if status != "sent")
+    if others:
+        summary += f" ({others})"
+    lines = ["id,name,status"]
+    lines += [f'{member.id},"{member.display_name.replace(chr(34), chr(34) * 2)}",{status}' for member, status in results]
+    report = discord.File(io.BytesIO("\n".join(lines).encode()), filename="broadcast_report.csv")
+    return summary, report
+
+class CredentialManager:
+    """
+    Refreshes OAuth credentials in the background, `margin` seconds before they expire, and saves them to
+    `token_path`. As long as that keeps working, google-auth never finds the token expired, so no request has to
+    wait for a refresh. A failed refresh is retried every TOKEN_REFRESH_RETRY seconds. If the token does expire
+    anyway, google-auth's own refresh on the next request still works as a fallback.
+    """
+    def __init__(self, credentials: Any, token_path: str = TOKEN_PATH, margin: float = TOKEN_REFRESH_MARGIN):
+        self.credentials = credentials
+        self.token_path = token_path
+        self.margin = margin
+        self._task: Optional[Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def seconds_until_refresh(self) -> float:
+        expiry: Optional[datetime] = self.credentials.expiry
+        if expiry is None:
+            # Nothing to go on, so check again later
+            return self.margin
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return max(0.0, (expiry - now).total_seconds() - self.margin)
+
+    def _refresh(self):
+        self.credentials.refresh(Request())
+        write_file_atomically(self.token_path, self.credentials.to_json())
+
+    async def refresh(self):
+        """Refresh the credentials and save them, off the event loop."""
+        with metrics.timer("poolbot_token_refresh_seconds"):
+            await get_running_loop().run_in_executor(None, self._refresh)
+
+    async def _run(self):
+        while True:
+            await sleep(self.seconds_until_refresh())
+            try:
+                await self.refresh()
+            except Exception as e:
+                metrics.inc("poolbot_token_refresh_errors_total")
+                print(f"sheets error — refreshing credentials: {e}")
+                await sleep(TOKEN_REFRESH_RETRY)
+
+class SheetsClient:
+    """
+    Wraps the Sheets `spreadsheets()` resource so that requests are executed on a dedicated, bounded thread pool
+    instead of blocking the event loop. Requests are built as usual and handed to `execute`. If given a
+    CredentialManager, `start` keeps the credentials fresh in the background.
+    """
+    def __init__(
+        self,
+        spreadsheets: Any,
+        credentials: Any,
+        max_workers: int = SHEETS_MAX_WORKERS,
+        credential_manager: Optional[CredentialManager] = None,
+    ):
+        self.spreadsheets = spreadsheets
+        self.credentials = credentials
+        self.credential_manager = credential_manager
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sheets")
+        # httplib2 connections aren't thread-safe, so each worker thread gets its own authorized transport
+        self._local = threading.local()
+
+    def start(self):
+        """Start refreshing credentials in the background. Must be called from a running event loop."""
+        if self.credential_manager is not None:
+            self.credential_manager.start()
+
+    def values(self) -> Any:
+        return self.spreadsheets.values()
+
+    def get(self, **kwargs) -> Any:
+        return self.spreadsheets.get(**kwargs)
+
+    def batchUpdate(self, **kwargs) -> Any:
+        return self.spreadsheets.batchUpdate(**kwargs)
+
+    def _execute(self, request: Any) -> Any:
+        if self.credentials is None:
+            return request.execute()
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+        return request.execute(http=http)
+
+    async def execute(self, request: Any) -> Any:
+        """Run a prepared Sheets API request on the worker pool and return its result."""
+        # e.g. sheets.spreadsheets.values.get
+        method = getattr(request, "methodId", None) or "unknown"
+        try:
+            with metrics.timer("poolbot_sheets_request_seconds", method=method):
+                return await get_running_loop().run_in_executor(self._executor, self._execute, request)
+        except Exception:
+            metrics.inc("poolbot_sheets_errors_total", method=method)
+            raise
+
+    def shutdown(self):
+        if self.credential_manager is not None:
+            self.credential_manager.stop()
+        self._executor.shutdown(wait=False)
+
+def load_sheet_credentials():
+    """Load (or refresh, or ask for) the Sheets credentials. Blocks on file and network I/O."""
     creds = None
     # The file token.json stores the user's access and refresh tokens, and is
     # created automatically when the authorization flow completes for the first
     # time.
-    if os.path.exists('token.json'):
-        creds = Credentials.from_authorized_user_file('token.json',
+    if os.path.exists(TOKEN_PATH):
+        creds = Credentials.from_authorized_user_file(TOKEN_PATH,
                                                       ['https://www.googleapis.com/auth/spreadsheets'])
     # If there are no (valid) credentials available, let the user log in.
     if not creds or not creds.valid:
@@ -256,44 +918,53 @@ async def get_sheet_client() -> Any:
                 'credentials.json', ['https://www.googleapis.com/auth/spreadsheets'])
             creds = flow.run_local_server(port=0)
         # Save the credentials for the next run
-        with open('token.json', 'w') as token:
-            token.write(creds.to_json())
-
-    try:
+        write_file_atomically(TOKEN_PATH, creds.to_json())
+    return creds
+
+async def get_sheet_client(
+        max_workers: int = SHEETS_MAX_WORKERS, refresh_margin: float = TOKEN_REFRESH_MARGIN
+) -> SheetsClient:
+    def connect() -> SheetsClient:
+        creds = load_sheet_credentials()
         service = build('sheets', 'v4', credentials=creds)
+        return SheetsClient(service.spreadsheets(), creds, max_workers, CredentialManager(creds, TOKEN_PATH, refresh_margin))
 
-        # Call the Sheets API
-        return service.spreadsheets()
+    try:
+        # Loading credentials and parsing the discovery document both block, so keep them off the event loop
+        client = await get_running_loop().run_in_executor(None, connect)
     except HttpError as err:
         print(err)
         raise
+    client.start()
+    return client
 
-async def get_spreadsheet_values(sheet: Any, spreadsheet_id: str, range: str, valueRenderOption="FORMATTED_VALUE") -> list[list[str]]:
+async def get_spreadsheet_values(sheet: SheetsClient, spreadsheet_id: str, range: str, valueRenderOption="FORMATTED_VALUE") -> list[list[str]]:
     """Fetch spreadsheet values with retry logic for transient errors. Raises SpreadsheetError on permanent failure."""
     retries = 0
     while retries < 5:
         try:
             # Call the Sheets API
-            result = sheet.values().get(spreadsheetId=spreadsheet_id,
-                                        range=range,
-                                        valueRenderOption=valueRenderOption).execute()
+            result = await sheet.execute(sheet.values().get(spreadsheetId=spreadsheet_id,
+                                                            range=range,
+                                                            valueRenderOption=valueRenderOption))
             return result.get('values', []) or []
         except (ssl.SSLEOFError, HttpError) as err:
             retries += 1
             if retries >= 5:
                 raise SpreadsheetError(f"Failed to fetch {range} after 5 retries: {err}")
             print(f"Spreadsheet error (attempt {retries}/5): {err}")
+            metrics.inc("poolbot_retries_total", operation="get_spreadsheet_values")
             await sleep(retries)
     return []
 
-async def get_sheet_title_by_id(spreadsheet: Any, spreadsheet_id: str, tab_id: str) -> str:
+async def get_sheet_title_by_id(spreadsheet: SheetsClient, spreadsheet_id: str, tab_id: str) -> str:
     """Resolve a numeric sheet tab ID to its title for A1 range notation."""
     tab_id_int = int(tab_id)
     try:
-        result = spreadsheet.get(
+        result = await spreadsheet.execute(spreadsheet.get(
             spreadsheetId=spreadsheet_id,
             fields='sheets(properties(sheetId,title))',
-        ).execute()
+        ))
     except HttpError as err:
         raise SpreadsheetError(f"Failed to fetch spreadsheet metadata: {err}")
     for sheet in result.get('sheets', []):
@@ -302,199 +973,1443 @@ async def get_sheet_title_by_id(spreadsheet: Any, spreadsheet_id: str, tab_id: s
             return props['title']
     raise SpreadsheetError(f"Sheet tab id {tab_id} not found in spreadsheet")
 
-async def set_cell_to_red(sheet, spreadsheet_id: str, tab_id: str, row: int, col: str):
+class SheetWriteBuffer:
+    """
+    Write-behind buffer for one spreadsheet. Queued appends, value updates and formatting requests are sent together
+    as one values.append per range, one values.batchUpdate and one spreadsheets.batchUpdate. A flush happens
+    `flush_interval` seconds after the first write is queued, or as soon as `max_pending` writes are waiting.
+
+    Flushes run one at a time, and within each kind of write the spreadsheet sees writes in the order they were
+    queued. Each queued write returns a future that resolves once its batch has been sent, or raises SpreadsheetError.
+    """
+    def __init__(self, sheet: SheetsClient, spreadsheet_id: str, flush_interval: float = SHEET_FLUSH_INTERVAL, max_pending: int = SHEET_FLUSH_MAX_PENDING):
+        self.sheet = sheet
+        self.spreadsheet_id = spreadsheet_id
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._appends: list[Tuple[str, list[list[Any]], Future[None]]] = []
+        self._updates: list[Tuple[str, list[list[Any]], Future[None]]] = []
+        self._formats: list[Tuple[dict[str, Any], Future[None]]] = []
+        self._flush_lock = Lock()
+        self._timer: Optional[TimerHandle] = None
+        self._flushes: set[Task] = set()
+
+    def pending(self) -> int:
+        return len(self._appends) + len(self._updates) + len(self._formats)
+
+    def append(self, range: str, rows: list[list[Any]]) -> Future[None]:
+        """Queue rows to be appended after the table in `range`."""
+        done: Future[None] = get_running_loop().create_future()
+        self._appends.append((range, rows, done))
+        self._schedule()
+        return done
+
+    def update(self, range: str, values: list[list[Any]]) -> Future[None]:
+        """Queue values to be written to `range`."""
+        done: Future[None] = get_running_loop().create_future()
+        self._updates.append((range, values, done))
+        self._schedule()
+        return done
+
+    def format(self, request: dict[str, Any]) -> Future[None]:
+        """Queue a single spreadsheets.batchUpdate request, such as updateCells."""
+        done: Future[None] = get_running_loop().create_future()
+        self._formats.append((request, done))
+        self._schedule()
+        return done
+
+    def _schedule(self):
+        if self.pending() >= self.max_pending:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = get_running_loop().call_later(self.flush_interval, self._start_flush)
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        task = create_task(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _send(self, request: Any, futures: Sequence[Future[None]], what: str):
+        try:
+            await self.sheet.execute(request)
+        except Exception as e:
+            # Not just HttpError - transport failures (timeouts, resets, httplib2 and token refresh errors) must fail
+            # the batch too, or whoever awaits it waits forever
+            print(f"spreadsheet error — {what}: {e!r}")
+            for future in futures:
+                if not future.done():
+                    future.set_exception(SpreadsheetError(f"Failed to flush {what}: {e}"))
+            return
+        for future in futures:
+            if not future.done():
+                future.set_result(None)
+
+    async def flush(self):
+        """Send everything queued so far."""
+        async with self._flush_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            appends, self._appends = self._appends, []
+            updates, self._updates = self._updates, []
+            formats, self._formats = self._formats, []
+            try:
+                await self._flush(appends, updates, formats)
+            finally:
+                # Whatever went wrong part way through, no write taken from the queue is left waiting
+                for future in [done for *_, done in appends] + [done for *_, done in updates] + [done for _, done in formats]:
+                    if not future.done():
+                        future.set_exception(SpreadsheetError("Flush did not complete"))
+
+    async def _flush(
+        self,
+        appends: list[Tuple[str, list[list[Any]], Future[None]]],
+        updates: list[Tuple[str, list[list[Any]], Future[None]]],
+        formats: list[Tuple[dict[str, Any], Future[None]]],
+    ):
+        appends_by_range: dict[str, list[Tuple[list[list[Any]], Future[None]]]] = {}
+        for range, rows, done in appends:
+            appends_by_range.setdefault(range, []).append((rows, done))
+        for range, batch in appends_by_range.items():
+            await self._send(
+                self.sheet.values().append(spreadsheetId=self.spreadsheet_id, range=range,
+                                           valueInputOption='USER_ENTERED',
+                                           body={'values': [row for rows, _ in batch for row in rows]}),
+                [done for _, done in batch],
+                f"appending to {range}",
+            )
+        if updates:
+            await self._send(
+                self.sheet.values().batchUpdate(spreadsheetId=self.spreadsheet_id, body={
+                    'valueInputOption': 'USER_ENTERED',
+                    'data': [{'range': range, 'values': values} for range, values, _ in updates],
+                }),
+                [done for _, _, done in updates],
+                "updating values",
+            )
+        if formats:
+            await self._send(
+                self.sheet.batchUpdate(spreadsheetId=self.spreadsheet_id,
+                                       body={'requests': [request for request, _ in formats]}),
+                [done for _, done in formats],
+                "updating formatting",
+            )
+
+    async def close(self):
+        """Flush anything still queued, waiting for flushes already underway."""
+        await gather(*self._flushes, return_exceptions=True)
+        await self.flush()
+
+def red_cell_request(tab_id: str, row: int, col: str) -> dict[str, Any]:
     # Note that this request (annoyingly) uses indices instead of the regular cell format.
-    color_body = {
-        'requests': [{
-            'updateCells': {
-                'rows': [{
-                    'values': [{
-                        'userEnteredFormat': {
-                            'backgroundColorStyle': {
-                                'rgbColor': {
-                                    "red": 1,
-                                    "green": 0,
-                                    "blue": 0,
-                                    "alpha": 1,
-                                }
+    return {
+        'updateCells': {
+            'rows': [{
+                'values': [{
+                    'userEnteredFormat': {
+                        'backgroundColorStyle': {
+                            'rgbColor': {
+                                "red": 1,
+                                "green": 0,
+                                "blue": 0,
+                                "alpha": 1,
                             }
                         }
-                    }]
-                }],
-                'fields': 'userEnteredFormat',
-                'range': {
-                    'sheetId': tab_id,
-                    'startRowIndex': row - 1,
-                    'endRowIndex': row,
-                    'startColumnIndex': ord(col) - ord('A'),
-                    'endColumnIndex': ord(col) - ord('A') + 1,
-                },
+                    }
+                }]
+            }],
+            'fields': 'userEnteredFormat',
+            'range': {
+                'sheetId': tab_id,
+                'startRowIndex': row - 1,
+                'endRowIndex': row,
+                'startColumnIndex': ord(col) - ord('A'),
+                'endColumnIndex': ord(col) - ord('A') + 1,
             },
-        }],
+        },
     }
-    try:
-        sheet.batchUpdate(spreadsheetId=spreadsheet_id,
-                          body=color_body).execute()
-    except HttpError as e:
-        print(f"spreadsheet error — setting cell to red: {e}")
-        raise SpreadsheetError(f"Failed to set cell to red: {e}")
 
-class PoolTracker():
-    def __init__(self, sheet: Any, pool_channel: discord.TextChannel, packs_channel: discord.TextChannel, spreadsheet_id: str, tab_id: str):
+async def set_cell_to_red(writes: SheetWriteBuffer, tab_id: str, row: int, col: str):
+    """Queue a cell to be highlighted red and wait for it to be written. Raises SpreadsheetError on failure."""
+    await writes.format(red_cell_request(tab_id, row, col))
+
+class PlayerDirectory:
+    """
+    Cached copy of the Player Database, indexed by Discord ID. The copy is reloaded once it is older than `ttl`
+    seconds or after `invalidate()`, and concurrent lookups during a reload share a single Sheets read.
+    """
+    def __init__(self, sheet: SheetsClient, spreadsheet_id: str, tab_id: Optional[str] = None, ttl: float = PLAYER_DIRECTORY_TTL):
         self.sheet = sheet
-        self.pool_channel = pool_channel
-        self.packs_channel = packs_channel
         self.spreadsheet_id = spreadsheet_id
+        # Without a tab ID, the tab is assumed to be titled "Player Database"
         self.tab_id = tab_id
-        self.pool_lock = Lock()
+        self.ttl = ttl
+        self._tab_name: Optional[str] = None
+        self._by_discord_id: dict[int, Tuple[int, PlayerDatabaseRow]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = Lock()
 
-    async def track_pack(self, message: discord.Message):
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    async def load(self, stale_load: Optional[float] = None):
+        """
+        Reload the Player Database if the cached copy is stale, or is still the one loaded at `stale_load`. Raises
+        SpreadsheetError.
+        """
+        if self._is_fresh() and (stale_load is None or self._loaded_at != stale_load):
+            return
+        async with self._lock:
+            # Another lookup may have finished reloading while this one waited
+            if self._is_fresh() and (stale_load is None or self._loaded_at != stale_load):
+                return
+            if self._tab_name is None:
+                self._tab_name = (
+                    await get_sheet_title_by_id(self.sheet, self.spreadsheet_id, self.tab_id)
+                    if self.tab_id else "Player Database"
+                )
+            tab_name = self._tab_name.replace("'", "''")
+            raw_player_data = await get_spreadsheet_values(self.sheet, self.spreadsheet_id, f"'{tab_name}'!A2:AE")
+            by_discord_id: dict[int, Tuple[int, PlayerDatabaseRow]] = {}
+            for row_index, row in enumerate(raw_player_data):
+                player = parse_player_row(row)
+                if player is not None and player["discord_id"] not in by_discord_id:
+                    by_discord_id[player["discord_id"]] = (row_index, player)
+            self._by_discord_id = by_discord_id
+            self._loaded_at = time.monotonic()
+
+    def get(self, discord_id: Optional[int]) -> Tuple[Optional[int], Optional[PlayerDatabaseRow]]:
+        """Look up a player in the cached copy, returning their row index (0 for the first player) and row."""
+        if discord_id is None:
+            return None, None
+        return self._by_discord_id.get(discord_id, (None, None))
+
+    async def lookup(
+            self, discord_id: Optional[int], reload_on_miss: bool = False
+    ) -> Tuple[Optional[int], Optional[PlayerDatabaseRow]]:
+        """
+        Like `get`, reloading first if needed. With `reload_on_miss`, a player missing from the cached copy makes it be
+        reloaded once, in case they were added since. Raises SpreadsheetError.
+        """
+        await self.load()
+        found = self.get(discord_id)
+        if found[1] is None and discord_id is not None and reload_on_miss:
+            # Lookups that miss at the same time share one reload
+            await self.load(stale_load=self._loaded_at)
+            found = self.get(discord_id)
+        return found
+
+class PoolsIndex:
+    """
+    Cached copy of the Pools tab, indexed by normalized pool name and by the Discord IDs looked up so far. Writes made
+    through the bot are applied to the cached rows. The copy is re-read after `ttl` seconds or `invalidate()`.
+    """
+    # Pools!B7:R200 - the first pool is on row 7
+    FIRST_ROW = 7
+
+    def __init__(self, sheet: SheetsClient, spreadsheet_id: str, players: PlayerDirectory, ttl: float = POOLS_INDEX_TTL):
+        self.sheet = sheet
+        self.spreadsheet_id = spreadsheet_id
+        self.players = players
+        self.ttl = ttl
+        # (row number, normalized name, row) in sheet order
+        self._rows: list[Tuple[int, str, PoolRow]] = []
+        self._by_name: dict[str, Tuple[int, PoolRow]] = {}
+        self._by_discord_id: dict[int, Tuple[int, PoolRow]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = Lock()
+
+    @staticmethod
+    def normalize(name: str) -> str:
+        return " ".join(name.lower().split())
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    async def load(self):
+        """Re-read the Pools tab if the cached copy is stale. Raises SpreadsheetError."""
+        if self._is_fresh():
+            return
+        async with self._lock:
+            if self._is_fresh():
+                return
+            raw_pools = await get_spreadsheet_values(self.sheet, self.spreadsheet_id, 'Pools!B7:R200')
+            rows: list[Tuple[int, str, PoolRow]] = []
+            by_name: dict[str, Tuple[int, PoolRow]] = {}
+            for row_num, raw_pool in enumerate(raw_pools, start=self.FIRST_ROW):
+                pool = parse_pool_row(raw_pool)
+                if pool is None:
+                    continue
+                name = self.normalize(pool.get("name", ""))
+                if not name:
+                    continue
+                rows.append((row_num, name, pool))
+                by_name.setdefault(name, (row_num, pool))
+            self._rows = rows
+            self._by_name = by_name
+            self._by_discord_id = {}
+            self._loaded_at = time.monotonic()
+
+    async def reload(self, row_num: int, pool: PoolRow) -> Optional[PoolRow]:
+        """
+        Re-read one cached row, for read-modify-writes that can't work from a copy up to `ttl` seconds old. Updates
+        `pool` in place and returns it, or invalidates the cache and returns None if the row no longer holds that pool.
+        Raises SpreadsheetError.
+        """
+        raw_pools = await get_spreadsheet_values(self.sheet, self.spreadsheet_id, f'Pools!B{row_num}:R{row_num}')
+        fresh = parse_pool_row(raw_pools[0]) if raw_pools else None
+        if fresh is None or self.normalize(fresh.get("name", "")) != self.normalize(pool.get("name", "")):
+            self.invalidate()
+            return None
+        # Counters left blank in the sheet aren't kept from the stale copy
+        pool.pop("maps_used", None)
+        pool.pop("maps_remaining", None)
+        pool.update(fresh)
+        return pool
+
+    async def find(self, display_name: str, discord_id: Optional[int] = None) -> Optional[Tuple[int, PoolRow]]:
         """
-        Track a pack in the Pools tab. This assumes the pack's owner is the last mention in the message, and that the pack contents is in a code fence.
+        Find a member's pool row and its row number. Tries the name they're registered under in the Player Database,
+        then an exact match on their display name, then the first pool whose name appears in their display name.
+        Raises SpreadsheetError.
         """
-        async with self.pool_lock:
-            content = message.embeds[0].description
-            ref = message.reference and message.reference.message_id and await message.channel.fetch_message(message.reference.message_id)
-            pack_owner_user_id_match = ref and re.search("<@!?(?P<id>\\d+)>", ref.content)
-            pack_owner_user_id = pack_owner_user_id_match and pack_owner_user_id_match.group("id")
+        await self.load()
+        if discord_id is not None:
+            found = self._by_discord_id.get(discord_id)
+            if found is not None:
+                return found
+            _, player = await self.players.lookup(discord_id)
+            found = player and self._by_name.get(self.normalize(player["name"]))
+            if found:
+                self._by_discord_id[discord_id] = found
+                return found
+        normalized = self.normalize(display_name)
+        found = self._by_name.get(normalized)
+        if found is not None:
+            return found
+        return next(((row_num, pool) for row_num, name, pool in self._rows if name in normalized), None)
+
+class PoolIdIndex:
+    """
+    Each player's current pool ID, taken from the last row naming them in the Pool Changes log. Rows are only ever
+    appended in practice, so after the initial load only rows past the last one read are fetched. A periodic full
+    reload catches edits to rows that were already read. Every row read is also handed to the pool store, if given.
+    """
+    # Pool Changes!B2:F - the first data row is 2
+    FIRST_ROW = 2
 
-            # Get and parse pool changes from spreadsheet
-            try:
+    def __init__(
+        self,
+        sheet: SheetsClient,
+        spreadsheet_id: str,
+        reconcile_interval: float = POOL_ID_RECONCILE_INTERVAL,
+        store: Optional["PoolStore"] = None,
+    ):
+        self.sheet = sheet
+        self.spreadsheet_id = spreadsheet_id
+        self.reconcile_interval = reconcile_interval
+        self.store = store
+        self.pool_ids: dict[str, str] = {}
+        self._rows_read = 0
+        self._last_reconcile: Optional[float] = None
+        self._lock = Lock()
+        # Pool IDs recorded while a full reload is in flight, which the reload's snapshot may not include yet
+        self._recorded_during_reload: dict[str, str] = {}
+
+    @staticmethod
+    def _apply(raw_changes: list[list[str]], pool_ids: dict[str, str]):
+        for change in (parse_pool_change_row(r) for r in raw_changes):
+            if change is not None and change["pool_id"]:
+                pool_ids[change["name"]] = change["pool_id"]
+
+    async def refresh(self):
+        """Pick up rows added to the log since the last read, or reload it entirely if due. Raises SpreadsheetError."""
+        async with self._lock:
+            now = time.monotonic()
+            if self._last_reconcile is None or now - self._last_reconcile >= self.reconcile_interval:
+                self._recorded_during_reload = {}
                 raw_changes = await get_spreadsheet_values(self.sheet, self.spreadsheet_id, 'Pool Changes!B2:F')
-            except SpreadsheetError as e:
-                print(f"spreadsheet error — fetching changes: {e}")
-                await self.set_cell_to_red(0, 'G')  # Can't determine row, use 0
-                return
-            changes = [c for c in (parse_pool_change_row(r) for r in raw_changes) if c is not None]
+                pool_ids: dict[str, str] = {}
+                self._apply(raw_changes, pool_ids)
+                pool_ids.update(self._recorded_during_reload)
+                self.pool_ids = pool_ids
+                self._rows_read = len(raw_changes)
+                self._last_reconcile = now
+                if self.store is not None:
+                    self.store.ingest(self.FIRST_ROW, raw_changes, complete=True)
+            else:
+                first_row = self.FIRST_ROW + self._rows_read
+                raw_changes = await get_spreadsheet_values(self.sheet, self.spreadsheet_id, f'Pool Changes!B{first_row}:F')
+                self._apply(raw_changes, self.pool_ids)
+                self._rows_read += len(raw_changes)
+                if self.store is not None:
+                    self.store.ingest(first_row, raw_changes)
+
+    def get(self, name: str) -> str:
+        return self.pool_ids.get(name, '')
+
+    def record(self, name: str, pool_id: str):
+        """Update a player's pool ID after appending a row for it, without waiting for the row to be read back."""
+        self.pool_ids[name] = pool_id
+        if self._lock.locked():
+            self._recorded_during_reload[name] = pool_id
+
+class PoolStore:
+    """
+    Every player's current pool, materialized locally from a spreadsheet's Pool Changes log so it can be served
+    without replaying the log over HTTP.
+
+    Each log row is stored as an event in sqlite. A pack event's contents come from the pool cache or sealeddeck.tech
+    and are fetched in the background. Events are folded into per-player CompactPools in memory: packs add or remove
+    every card they contain, and card events add or remove one card. Counts are only summed, like in
+    `pool_from_changes`, so events can be folded in any order. Every `snapshot_every` events, a player's counts are
+    saved as a snapshot, so a restart only has to refold events after it. A row that is edited or deleted in the log
+    makes its players' pools be rebuilt from their events.
+    """
+    PACK_OPERATIONS = ("add pack", "remove pack")
+    CARD_OPERATIONS = ("add card", "remove card")
 
-            # Find player in database (name is column B, discord ID is column F)
-            try:
-                raw_player_data = await get_spreadsheet_values(self.sheet, self.spreadsheet_id, "Player Database!B2:F")
-            except SpreadsheetError as e:
-                print(f"spreadsheet error — fetching player data: {e}")
-                await self.set_cell_to_red(0, 'G')
+    def __init__(
+        self,
+        path: str,
+        log: str,
+        session: aiohttp.ClientSession,
+        pool_cache: PoolCache,
+        snapshot_every: int = POOL_STORE_SNAPSHOT_EVERY,
+        fetch_concurrency: int = SEALEDDECK_FETCH_CONCURRENCY,
+    ):
+        # Identifies the log (spreadsheet) this store's events come from, as several can share a database
+        self.log = log
+        self.session = session
+        self.pool_cache = pool_cache
+        self.snapshot_every = snapshot_every
+        self.fetch_concurrency = fetch_concurrency
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pool_events (log TEXT NOT NULL, row INTEGER NOT NULL, player TEXT NOT NULL, "
+            "operation TEXT NOT NULL, value TEXT NOT NULL, cards TEXT, PRIMARY KEY (log, row))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pool_snapshots (log TEXT NOT NULL, player TEXT NOT NULL, "
+            "row INTEGER NOT NULL, cards TEXT NOT NULL, PRIMARY KEY (log, player))"
+        )
+        self._db.commit()
+        self._pools: dict[str, CompactPool] = {}
+        # Last row folded into each player's pool, and how many events were folded since their last snapshot
+        self._last_row: dict[str, int] = {}
+        self._since_snapshot: Counter[str] = Counter()
+        # Rows of pack events whose contents haven't been fetched yet, by player
+        self._pending: defaultdict[str, set[int]] = defaultdict(set)
+        self._pending_added = Event()
+        self._resolver: Optional[Task] = None
+        self._load()
+
+    @staticmethod
+    def parse(row: list[str]) -> Optional[Tuple[str, str, str]]:
+        """(player, operation, value) from a Pool Changes!B:F row, or None if it isn't a change."""
+        player, operation, value = (row + ["", "", ""])[:3]
+        if not player or operation not in PoolStore.PACK_OPERATIONS + PoolStore.CARD_OPERATIONS:
+            return None
+        return player, operation, value
+
+    def _load(self):
+        snapshot_rows: dict[str, int] = {}
+        for player, row, cards in self._db.execute(
+                "SELECT player, row, cards FROM pool_snapshots WHERE log = ?", (self.log,)):
+            self._pools[player] = CompactPool.from_counts(json.loads(cards))
+            self._last_row[player] = snapshot_rows[player] = row
+        for row, player, operation, value, cards in self._db.execute(
+                "SELECT row, player, operation, value, cards FROM pool_events WHERE log = ? ORDER BY row", (self.log,)):
+            if row > snapshot_rows.get(player, 0):
+                self._apply(row, player, operation, value, cards)
+
+    def _apply(self, row: int, player: str, operation: str, value: str, cards: Optional[str]):
+        pool = self._pools.setdefault(player, CompactPool())
+        self._last_row[player] = max(row, self._last_row.get(player, 0))
+        sign = -1 if operation.startswith("remove") else 1
+        if operation in self.PACK_OPERATIONS:
+            if cards is None:
+                self._pending[player].add(row)
+                self._pending_added.set()
                 return
-            player_data = [p for p in (parse_player_row(r) for r in raw_player_data) if p is not None]
-            if pack_owner_user_id is None:
-                raise ValueError("Could not extract user ID from message reference")
-            player_match = next(((i, p) for i, p in enumerate(player_data) if p["discord_id"] == int(pack_owner_user_id)), (None, None))
-            player_row_index, player_row = player_match
-
-            if player_row is None or player_row_index is None:
-                # This should only happen during debugging / spreadsheet setup
-                print(f"rut row. No pool found for {pack_owner_user_id}")
-                raise ValueError(f"No pool found for {pack_owner_user_id}")
-            
-            # pool row starts at 7 (1-indexed), player rows start at 0, so add 7 to the index
-            row_num = player_row_index + 7
-            name = player_row["name"]
-
-            # current pool is last pool in the changes that matches the player name
-            current_pool_id = ''
-            for change in changes:
-                if change["name"] == name and change["pool_id"]:
-                    current_pool_id = change["pool_id"]
-
-            if current_pool_id == '':
-                print(f"rut row. No pool found for {name}")
-                await self.set_cell_to_red(row_num, 'G')
-                raise ValueError(f"No pool found for {name}")
-
-            # either it's a single pack or there's a Sealeddeck ID
-            if content and "```" in content:
-                pack_content = content.split("```")[1].strip()
-                pack_json = arena_to_json(pack_content)
+            pool.add(CompactPool.from_entries(json.loads(cards)), sign)
+        else:
+            pool.add_card(value, sign)
+        self._since_snapshot[player] += 1
+
+    def _maybe_snapshot(self, player: str):
+        if self._pending.get(player) or self._since_snapshot[player] < self.snapshot_every:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO pool_snapshots VALUES (?, ?, ?, ?)",
+            (self.log, player, self._last_row[player], json.dumps(self._pools[player].to_counts())),
+        )
+        self._since_snapshot[player] = 0
+
+    def _rebuild(self, player: str):
+        self._db.execute("DELETE FROM pool_snapshots WHERE log = ? AND player = ?", (self.log, player))
+        self._pools.pop(player, None)
+        self._last_row.pop(player, None)
+        self._pending.pop(player, None)
+        self._since_snapshot[player] = 0
+        for row, operation, value, cards in self._db.execute(
+                "SELECT row, operation, value, cards FROM pool_events WHERE log = ? AND player = ? ORDER BY row",
+                (self.log, player)):
+            self._apply(row, player, operation, value, cards)
+
+    def ingest(self, first_row: int, raw_changes: list[list[str]], complete: bool = False):
+        """
+        Record Pool Changes rows read from the log, the first of which is `first_row`. Rows already stored unchanged
+        are skipped. With `complete`, these are all of the log's rows, so stored rows past the end are dropped.
+        """
+        last_row = first_row + len(raw_changes) - 1
+        stored: dict[int, Tuple[str, str, str]] = {
+            row: (player, operation, value) for row, player, operation, value in self._db.execute(
+                "SELECT row, player, operation, value FROM pool_events WHERE log = ? AND row >= ?"
+                + ("" if complete else " AND row <= ?"),
+                (self.log, first_row) if complete else (self.log, first_row, last_row),
+            )
+        }
+        rebuild: set[str] = set()
+        for row, raw_change in enumerate(raw_changes, start=first_row):
+            change = self.parse(raw_change)
+            previous = stored.pop(row, None)
+            if change == previous:
+                continue
+            if previous is not None:
+                # An edited row - fold the affected pools again from scratch
+                rebuild.add(previous[0])
+                self._db.execute("DELETE FROM pool_events WHERE log = ? AND row = ?", (self.log, row))
+            if change is None:
+                continue
+            self._db.execute("INSERT INTO pool_events VALUES (?, ?, ?, ?, ?, NULL)", (self.log, row, *change))
+            if previous is not None:
+                rebuild.add(change[0])
             else:
-                field = next(filter(lambda f: f.name == "SealedDeck.Tech ID", message.embeds[0].fields))
-                field_value = field.value or ""
-                try:
-                    pack_json = await sealeddeck_pool(field_value.replace("`", ""))
-                except SealedDeckError as e:
-                    print(f"sealeddeck error — fetching pack: {e}")
-                    await self.set_cell_to_red(row_num, 'G')
-                    return
+                self._apply(row, *change, None)
+        # Only left over with `complete`: rows that have been deleted from the log
+        for row, (player, _, _) in stored.items():
+            rebuild.add(player)
+            self._db.execute("DELETE FROM pool_events WHERE log = ? AND row = ?", (self.log, row))
+        for player in rebuild:
+            self._rebuild(player)
+        for player in {change[0] for change in map(self.parse, raw_changes) if change is not None} | rebuild:
+            self._maybe_snapshot(player)
+        self._db.commit()
+
+    async def resolve(self, player: Optional[str] = None):
+        """
+        Fetch the contents of packs not yet folded in, for one player or everyone, and fold them into their pools.
+        Raises SealedDeckError naming every pack that could not be fetched.
+        """
+        players = [player] if player is not None else list(self._pending)
+        pending = [(name, row) for name in players for row in self._pending.get(name, ())]
+        if not pending:
+            return
+        events = self._events([row for _, row in pending])
+        semaphore = Semaphore(self.fetch_concurrency)
+
+        async def fetch(pack_id: str) -> Sequence[SealedDeckEntry]:
+            async with semaphore:
+                return await sealeddeck_pool(self.session, pack_id, self.pool_cache)
+
+        rows = [(name, row) for name, row in pending if row in events]
+        results = await gather(*(fetch(events[row][2]) for _, row in rows), return_exceptions=True)
+        # Rows edited while packs were fetched are pending again, but for whatever they name now
+        current = self._events([row for _, row in rows])
+        failed: list[str] = []
+        for (name, row), result in zip(rows, results):
+            _, operation, pack_id = events[row]
+            if isinstance(result, BaseException):
+                failed.append(pack_id)
+                continue
+            # Another resolve may also have folded this row in meanwhile
+            if current.get(row) != events[row] or row not in self._pending.get(name, ()):
+                continue
+            self._pending[name].discard(row)
+            cards = json.dumps(result)
+            self._db.execute("UPDATE pool_events SET cards = ? WHERE log = ? AND row = ?", (cards, self.log, row))
+            self._apply(row, name, operation, pack_id, cards)
+            self._maybe_snapshot(name)
+        self._db.commit()
+        if failed:
+            raise SealedDeckError(f"Failed to fetch packs: {', '.join(failed)}")
+
+    def _events(self, rows: Sequence[int]) -> dict[int, Tuple[str, str, str]]:
+        """(player, operation, value) of each of the stored rows."""
+        return {
+            row: (player, operation, value) for row, player, operation, value in self._db.execute(
+                f"SELECT row, player, operation, value FROM pool_events WHERE log = ? AND row IN ({','.join('?' * len(rows))})",
+                (self.log, *rows),
+            )
+        }
+
+    def start(self):
+        self._resolver = create_task(self._resolve_pending())
+
+    async def stop(self):
+        if self._resolver is not None:
+            self._resolver.cancel()
+            await gather(self._resolver, return_exceptions=True)
+            self._resolver = None
 
+    async def _resolve_pending(self):
+        while True:
+            await self._pending_added.wait()
+            self._pending_added.clear()
             try:
-                new_pack_id = await pool_to_sealeddeck(pack_json)
-                updated_pool_id = await pool_to_sealeddeck(pack_json, current_pool_id)
+                await self.resolve()
             except SealedDeckError as e:
-                print(f"sealeddeck error — updating pool: {e}")
-                await self.set_cell_to_red(row_num, 'G')
-                return
+                print(f"sealeddeck error — filling in the pool store: {e}")
+                await sleep(POOL_STORE_RETRY_DELAY)
+                self._pending_added.set()
+
+    async def pool(self, player: str) -> Optional[Sequence[SealedDeckEntry]]:
+        """
+        A player's current pool, or None if the log has nothing for them. This only has to wait if some of their
+        packs haven't been fetched yet. Raises SealedDeckError.
+        """
+        if self._pending.get(player):
+            await self.resolve(player)
+        stored = self._pools.get(player)
+        if stored is None:
+            return None
+        return sorted(stored.to_entries(), key=lambda card: card["name"])
+
+    def diff(self, player: str, pool: Sequence[SealedDeckEntry]) -> Tuple[Sequence[SealedDeckEntry], Sequence[SealedDeckEntry]]:
+        """Cards in the player's stored pool that `pool` lacks, and cards in `pool` that the stored pool lacks."""
+        stored = self._pools.get(player, CompactPool())
+        # Only cards actually in the stored pool count, not ones removed before they were added
+        only_stored, only_other = CompactPool(np.maximum(stored.counts, 0)).diff(CompactPool.from_entries(pool))
+        return (
+            sorted(only_stored.to_entries(), key=lambda card: card["name"]),
+            sorted(only_other.to_entries(), key=lambda card: card["name"]),
+        )
+
+    def totals(self) -> Sequence[SealedDeckEntry]:
+        """Copies of each card across every player's pool, as far as their packs have been fetched."""
+        return sorted(CompactPool.aggregate(self._pools.values()).to_entries(), key=lambda card: card["name"])
+
+    def close(self):
+        self._db.close()
+
+J = TypeVar("J")
 
+class Pipeline(Generic[J]):
+    """
+    Passes jobs through a fixed sequence of stages, each with its own pool of worker tasks. Stages are joined by
+    bounded queues, so a slow stage pushes back on the stages before it and ultimately on `submit`.
+
+    A stage handler returns True to hand the job to the next stage, or False if the job is finished. It can also return
+    None to take the job out of the pipeline for now, in which case it's up to the handler's owner to `submit` it again.
+    `on_done` is called once for every job when it leaves the pipeline, with the exception that ended it, if any.
+    """
+    def __init__(
+        self,
+        name: str,
+        stages: Sequence[Tuple[str, Callable[[J], Awaitable[Optional[bool]]], int]],
+        on_done: Callable[[J, Optional[BaseException]], None],
+        queue_size: int = PACK_PIPELINE_QUEUE_SIZE,
+    ):
+        self.name = name
+        self.stages = stages
+        self.on_done = on_done
+        self.queues: list[Queue[J]] = [Queue(maxsize=queue_size) for _ in stages]
+        self._workers: list[Task] = []
+
+    def start(self):
+        for index, (_stage_name, _handler, workers) in enumerate(self.stages):
+            for _ in range(workers):
+                self._workers.append(create_task(self._work(index)))
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, job: J, stage: Optional[str] = None):
+        """Queue a job for the first stage, or the named one, waiting for room if the pipeline is backed up."""
+        index = 0 if stage is None else [stage_name for stage_name, _, _ in self.stages].index(stage)
+        await self._put(index, job)
+
+    def depths(self) -> dict[str, int]:
+        return {stage_name: queue.qsize() for (stage_name, _, _), queue in zip(self.stages, self.queues)}
+
+    def _record_depth(self, index: int):
+        stage_name = self.stages[index][0]
+        metrics.set("poolbot_pipeline_queue_depth", self.queues[index].qsize(), pipeline=self.name, stage=stage_name)
+
+    async def _put(self, index: int, job: J):
+        await self.queues[index].put(job)
+        self._record_depth(index)
+
+    async def _work(self, index: int):
+        stage_name, handler, _ = self.stages[index]
+        queue = self.queues[index]
+        while True:
+            job = await queue.get()
+            self._record_depth(index)
             try:
-                await self.write_pack(name, new_pack_id, updated_pool_id)
-            except SpreadsheetError as e:
-                print(f"spreadsheet error — writing pack: {e}")
-                await self.set_cell_to_red(row_num, 'G')
-                return
+                with metrics.timer("poolbot_pipeline_stage_seconds", pipeline=self.name, stage=stage_name):
+                    forward = await handler(job)
+            except Exception as e:
+                metrics.inc("poolbot_pipeline_stage_errors_total", pipeline=self.name, stage=stage_name)
+                print(f"{self.name} error — {stage_name}: {e}")
+                self.on_done(job, e)
+                continue
+            finally:
+                queue.task_done()
+            if forward is None:
+                continue
+            if forward and index + 1 < len(self.queues):
+                await self._put(index + 1, job)
+            else:
+                self.on_done(job, None)
+
+@dataclass
+class RetryEntry:
+    """A pack whose tracking failed because sealeddeck.tech or Sheets did, and where to pick it back up."""
+    message_id: int
+    # Pipeline stage to resume at: "owner" if the pack's contents weren't known yet, otherwise "pool"
+    stage: str
+    owner_id: int
+    name: str
+    row_num: int
+    pack_json: Sequence[SealedDeckEntry]
+    attempts: int = 0
+    # Epoch seconds
+    next_attempt: float = 0.0
+    last_error: str = ""
+
+class RetryQueue:
+    """
+    Packs waiting to be tracked again, in a sqlite table so they survive restarts. Entries belong to a queue (one
+    per pool tracker) and are keyed by the pack's message ID.
+    """
+    def __init__(self, path: str = RETRY_QUEUE_PATH):
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS retries ("
+            "queue TEXT NOT NULL, message_id INTEGER NOT NULL, stage TEXT NOT NULL, owner_id INTEGER NOT NULL, "
+            "name TEXT NOT NULL, row_num INTEGER NOT NULL, pack TEXT NOT NULL, attempts INTEGER NOT NULL, "
+            "next_attempt REAL NOT NULL, last_error TEXT NOT NULL, PRIMARY KEY (queue, message_id))"
+        )
+        self._db.commit()
 
-    async def write_pack(self, name: str, new_pack_id: str, updated_pool_id: str):
-        pack_body = {
-            'values': [
-                [datetime.now().isoformat(),name,"add pack",new_pack_id,"",updated_pool_id],
+    def add(self, queue: str, entry: RetryEntry):
+        self._db.execute(
+            "INSERT OR REPLACE INTO retries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (queue, entry.message_id, entry.stage, entry.owner_id, entry.name, entry.row_num,
+             json.dumps(entry.pack_json), entry.attempts, entry.next_attempt, entry.last_error),
+        )
+        self._db.commit()
+
+    def next(self, queue: str) -> Optional[RetryEntry]:
+        """The entry due soonest, whether or not it's due yet."""
+        row = self._db.execute(
+            "SELECT message_id, stage, owner_id, name, row_num, pack, attempts, next_attempt, last_error "
+            "FROM retries WHERE queue = ? ORDER BY next_attempt LIMIT 1",
+            (queue,),
+        ).fetchone()
+        if row is None:
+            return None
+        message_id, stage, owner_id, name, row_num, pack, attempts, next_attempt, last_error = row
+        return RetryEntry(message_id, stage, owner_id, name, row_num, json.loads(pack), attempts, next_attempt, last_error)
+
+    def defer(self, queue: str, until: float):
+        """Hold back every entry due before `until`, e.g. while the service they depend on is down."""
+        self._db.execute("UPDATE retries SET next_attempt = ? WHERE queue = ? AND next_attempt < ?", (until, queue, until))
+        self._db.commit()
+
+    def remove(self, queue: str, message_id: int):
+        self._db.execute("DELETE FROM retries WHERE queue = ? AND message_id = ?", (queue, message_id))
+        self._db.commit()
+
+    def count(self, queue: str) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM retries WHERE queue = ?", (queue,)).fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+@dataclass
+class PackJob:
+    """A pack making its way through the PoolTracker pipeline. Fields are filled in by each stage in turn."""
+    # None for retried packs that resume after their contents were known
+    message: Optional[discord.Message]
+    # Resolves to True once the pack has been written to the Pool Changes log, or False if tracking failed
+    done: Future[bool]
+    owner_id: int = 0
+    name: str = ""
+    row_num: int = 0
+    pack_json: Sequence[SealedDeckEntry] = ()
+    current_pool_id: str = ""
+    new_pack_id: str = ""
+    updated_pool_id: str = ""
+    tracked: bool = False
+    # Packs with the same order key keep their submission order. It's the owner if they're known up front.
+    order_key: Hashable = None
+    # Whether the owner is known (or the pack left the pipeline before they were), and whether the pack has joined
+    # their queue of packs
+    resolved: bool = False
+    left: bool = False
+    admitted: bool = False
+    # perf_counter() when the pack joined its owner's queue
+    admitted_at: float = 0.0
+    # Set when sealeddeck.tech or Sheets failed, so the pack can be retried later
+    failure: Optional[str] = None
+    # The queue entry this job is retrying, if any
+    retry: Optional[RetryEntry] = None
+
+class PoolTracker():
+    def __init__(
+        self,
+        sheet: SheetsClient,
+        writes: SheetWriteBuffer,
+        session: aiohttp.ClientSession,
+        pool_cache: PoolCache,
+        retries: RetryQueue,
+        players: PlayerDirectory,
+        pool_channel: discord.TextChannel,
+        packs_channel: discord.TextChannel,
+        spreadsheet_id: str,
+        tab_id: str,
+        reconcile_interval: float = POOL_ID_RECONCILE_INTERVAL,
+        max_concurrency: int = POOL_TRACKER_CONCURRENCY,
+        workers: Optional[dict[str, int]] = None,
+        queue_size: int = PACK_PIPELINE_QUEUE_SIZE,
+        retry_max_attempts: int = RETRY_MAX_ATTEMPTS,
+        retry_drain_rate: float = RETRY_DRAIN_RATE,
+        pool_store: Optional[PoolStore] = None,
+    ):
+        self.sheet = sheet
+        self.writes = writes
+        self.retries = retries
+        # Each tracker's failed packs are queued separately
+        self.retry_queue = str(packs_channel.id)
+        self.retry_max_attempts = retry_max_attempts
+        # Retried packs are resubmitted gradually so a recovered service isn't hit by the whole backlog at once
+        self.retry_bucket = TokenBucket(retry_drain_rate, 1)
+        self._retries_waiting = Event()
+        self._drainer: Optional[Task] = None
+        self.players = players
+        self.session = session
+        self.pool_cache = pool_cache
+        self.pool_channel = pool_channel
+        self.packs_channel = packs_channel
+        self.spreadsheet_id = spreadsheet_id
+        self.tab_id = tab_id
+        # Packs for the same player are tracked one at a time, in the order they were submitted, so each builds on the
+        # pool left by the last one. Packs waiting on an earlier one are held here rather than in a pipeline stage, so
+        # they don't tie up its workers.
+        self.max_concurrency = max_concurrency
+        # Submitted packs that haven't joined their owner's queue yet, by order key, oldest first
+        self._unadmitted: dict[Hashable, deque[PackJob]] = {}
+        # Each player's admitted packs, the first of which is in the pipeline if the player is active, and how many
+        # packs there are across all of them
+        self._owner_packs: dict[int, deque[PackJob]] = {}
+        self._admitted = 0
+        self._active = 0
+        self._waiting_owners: deque[int] = deque()
+        self._resubmits: set[Task] = set()
+        self.pool_store = pool_store
+        self.pool_ids = PoolIdIndex(sheet, spreadsheet_id, reconcile_interval, pool_store)
+        workers = {**PACK_PIPELINE_WORKERS, **(workers or {})}
+        self.pipeline: Pipeline[PackJob] = Pipeline(
+            f"pool tracker ({packs_channel.name})",
+            [
+                ("owner", self._resolve_owner, workers["owner"]),
+                ("pool", self._resolve_pool, workers["pool"]),
+                ("sealeddeck", self._merge_pool, workers["sealeddeck"]),
+                ("write", self._write, workers["write"]),
             ],
-        }
-        # Find the proper column ID
+            self._finish,
+            queue_size,
+        )
+
+    def start(self):
+        self.pipeline.start()
+        self._drainer = create_task(self._drain_retries())
+        if self.pool_store is not None:
+            self.pool_store.start()
+
+    async def stop(self):
+        if self._drainer is not None:
+            self._drainer.cancel()
+            await gather(self._drainer, return_exceptions=True)
+            self._drainer = None
+        for task in self._resubmits:
+            task.cancel()
+        await gather(*self._resubmits, return_exceptions=True)
+        await self.pipeline.stop()
+        if self.pool_store is not None:
+            await self.pool_store.stop()
+
+    async def track_pack(self, message: discord.Message) -> Future[bool]:
+        """
+        Queue a pack to be tracked in the Pool Changes log. This assumes the pack's owner is mentioned in the message
+        it replies to, and that the pack contents is in a code fence or a SealedDeck.Tech ID field.
+
+        Returns once the pack is queued. The returned future resolves when tracking finishes.
+        """
+        job = PackJob(message, get_running_loop().create_future())
+        await self._submit(job)
+        return job.done
+
+    async def _submit(self, job: PackJob, stage: str = "owner"):
+        job.order_key = self._order_key(job)
+        self._unadmitted.setdefault(job.order_key, deque()).append(job)
+        if stage == "owner":
+            await self.pipeline.submit(job)
+        elif self._admit(job):
+            await self.pipeline.submit(job, stage)
+
+    @staticmethod
+    def _order_key(job: PackJob) -> Hashable:
+        """
+        The pack's owner, if the message it replies to is already cached. Otherwise the message, as every pack replying
+        to it has the same owner. Packs only wait on earlier ones with the same key to find their owner, so a slow
+        lookup for one player's pack doesn't hold up anyone else's.
+        """
+        if job.message is None:
+            return job.owner_id
+        ref = job.message.reference
+        if ref is None or ref.message_id is None:
+            return ("message", job.message.id)
+        cached = ref.resolved if isinstance(ref.resolved, discord.Message) else ref.cached_message
+        owner = cached and re.search("<@!?(?P<id>\\d+)>", cached.content)
+        return int(owner.group("id")) if owner else ("reference", ref.message_id)
+
+    def _admit(self, job: PackJob) -> bool:
+        """
+        Note that a submitted pack's owner is known, or that it left the pipeline before they were. Packs join their
+        owner's queue in submission order, so this holds on to a pack until earlier ones with its order key are in.
+
+        Returns whether `job` is first in line and can go on to the pool stage now. Any other packs that can are
+        resubmitted.
+        """
+        job.resolved = True
+        unadmitted = self._unadmitted[job.order_key]
+        proceed = False
+        while unadmitted and unadmitted[0].resolved:
+            ready = unadmitted.popleft()
+            if ready.left:
+                continue
+            ready.admitted = True
+            ready.admitted_at = time.perf_counter()
+            self._admitted += 1
+            packs = self._owner_packs.setdefault(ready.owner_id, deque())
+            packs.append(ready)
+            if len(packs) > 1:
+                continue
+            if self._active >= self.max_concurrency:
+                self._waiting_owners.append(ready.owner_id)
+                continue
+            self._active += 1
+            if ready is job:
+                proceed = True
+            else:
+                self._resubmit(ready)
+        if not unadmitted:
+            del self._unadmitted[job.order_key]
+        self._record_waiting()
+        return proceed
+
+    def _record_waiting(self):
+        # Admitted packs that aren't in the pipeline, behind their owner's earlier packs or waiting for a free slot
+        metrics.set("poolbot_packs_waiting_on_owner", self._admitted - self._active, pipeline=self.pipeline.name)
+
+    def _resubmit(self, job: PackJob):
+        task = create_task(self.pipeline.submit(job, "pool"))
+        self._resubmits.add(task)
+        task.add_done_callback(self._resubmits.discard)
+
+    def _next_pack(self, job: PackJob):
+        """Start the owner's next pack now that this one has left the pipeline, or another player's if they're done."""
+        packs = self._owner_packs[job.owner_id]
+        packs.popleft()
+        self._admitted -= 1
+        if packs:
+            self._resubmit(packs[0])
+        else:
+            del self._owner_packs[job.owner_id]
+            self._active -= 1
+            if self._waiting_owners:
+                self._active += 1
+                self._resubmit(self._owner_packs[self._waiting_owners.popleft()][0])
+        self._record_waiting()
+
+    async def _resolve_owner(self, job: PackJob) -> Optional[bool]:
+        """Find who the pack belongs to and what's in it."""
+        message = job.message
+        if message is None:
+            raise ValueError("Pack message missing")
+        ref = message.reference and message.reference.message_id and await message.channel.fetch_message(message.reference.message_id)
+        pack_owner_user_id_match = ref and re.search("<@!?(?P<id>\\d+)>", ref.content)
+        pack_owner_user_id = pack_owner_user_id_match and pack_owner_user_id_match.group("id")
+        if pack_owner_user_id is None:
+            raise ValueError("Could not extract user ID from message reference")
+        job.owner_id = int(pack_owner_user_id)
+
+        # Find player in database
+        try:
+            player_row_index, player_row = await self.players.lookup(job.owner_id, reload_on_miss=True)
+        except SpreadsheetError as e:
+            print(f"spreadsheet error — fetching player data: {e}")
+            return self._failed(job, e)
+
+        if player_row is None or player_row_index is None:
+            # This should only happen during debugging / spreadsheet setup
+            print(f"rut row. No pool found for {job.owner_id}")
+            raise ValueError(f"No pool found for {job.owner_id}")
+
+        # pool row starts at 7 (1-indexed), player rows start at 0, so add 7 to the index
+        job.row_num = player_row_index + 7
+        job.name = player_row["name"]
+
+        # either it's a single pack or there's a Sealeddeck ID
+        content = message.embeds[0].description
+        if content and "```" in content:
+            pack_content = content.split("```")[1].strip()
+            job.pack_json = arena_to_json(pack_content)
+            if not job.pack_json:
+                await self.set_cell_to_red(job.row_num, 'G')
+                raise ValueError(f"No cards found in pack for {job.name}")
+        else:
+            field = next(filter(lambda f: f.name == "SealedDeck.Tech ID", message.embeds[0].fields))
+            field_value = field.value or ""
+            try:
+                job.pack_json = await sealeddeck_pool(self.session, field_value.replace("`", ""), self.pool_cache)
+            except SealedDeckError as e:
+                print(f"sealeddeck error — fetching pack: {e}")
+                return self._failed(job, e)
+        # Packs behind one of the owner's earlier ones are resubmitted once it's done
+        return self._admit(job) or None
+
+    async def _resolve_pool(self, job: PackJob) -> bool:
+        """Look up the pool this pack will be added to. The owner's earlier packs have all left the pipeline by now."""
+        # How long the pack waited on the owner's earlier packs and for a free slot, like a per-player lock wait
+        waited = time.perf_counter() - job.admitted_at
+        metrics.set("poolbot_owner_wait_seconds", waited, pipeline=self.pipeline.name)
+        metrics.observe("poolbot_owner_wait_duration_seconds", waited, pipeline=self.pipeline.name)
+        # Pick up any pool changes added since the last pack
         try:
-            self.sheet.values().append(spreadsheetId=self.spreadsheet_id,
-                                       range=f'Pool Changes!A:D', valueInputOption='USER_ENTERED',
-                                       body=pack_body).execute()
-        except HttpError as e:
-            print(f"spreadsheet error — writing pack: {e}")
-            raise SpreadsheetError(f"Failed to write pack to spreadsheet: {e}")
+            await self.pool_ids.refresh()
+        except SpreadsheetError as e:
+            print(f"spreadsheet error — fetching changes: {e}")
+            return self._failed(job, e)
+
+        # current pool is last pool in the changes that matches the player name
+        job.current_pool_id = self.pool_ids.get(job.name)
+
+        if job.current_pool_id == '':
+            print(f"rut row. No pool found for {job.name}")
+            await self.set_cell_to_red(job.row_num, 'G')
+            raise ValueError(f"No pool found for {job.name}")
+        return True
+
+    async def _merge_pool(self, job: PackJob) -> bool:
+        """Upload the pack on its own and merged into the owner's pool. The two uploads are independent."""
+        try:
+            job.new_pack_id, job.updated_pool_id = await gather(
+                pool_to_sealeddeck(self.session, job.pack_json),
+                pool_to_sealeddeck(self.session, job.pack_json, job.current_pool_id),
+            )
+        except SealedDeckError as e:
+            print(f"sealeddeck error — updating pool: {e}")
+            return self._failed(job, e)
+        # The pool store reads the pack back by its new ID once its row is written
+        self.pool_cache.put(job.new_pack_id, job.pack_json)
+        return True
+
+    async def _write(self, job: PackJob) -> Optional[bool]:
+        """
+        Queue the pack's row and move on. Waiting for the flush here would let no more rows into a batch than there are
+        write workers, so the job leaves the pipeline from the flush's callback instead.
+        """
+        self.queue_pack(job.name, job.new_pack_id, job.updated_pool_id).add_done_callback(
+            lambda written: self._written(job, written)
+        )
+        return None
+
+    def _written(self, job: PackJob, written: Future[None]):
+        # The write buffer only ever fails writes with SpreadsheetError
+        error = SpreadsheetError("Write was cancelled") if written.cancelled() else written.exception()
+        if error is None:
+            job.tracked = True
+        else:
+            print(f"spreadsheet error — writing pack: {error}")
+            job.failure = str(error)
+        self._finish(job, None)
+
+    @staticmethod
+    def _failed(job: PackJob, error: PoolBotError) -> bool:
+        """Stop tracking the pack for now. It's queued to be retried once it leaves the pipeline."""
+        job.failure = str(error)
+        return False
+
+    def _finish(self, job: PackJob, error: Optional[BaseException]):
+        if job.admitted:
+            self._next_pack(job)
+        elif job.order_key is not None and not job.resolved:
+            job.left = True
+            self._admit(job)
+        if job.failure is not None and job.retry is None and job.message is not None:
+            # Without the contents, the pack has to be read from its message again
+            stage = "pool" if job.pack_json else "owner"
+            self.retries.add(self.retry_queue, RetryEntry(
+                job.message.id, stage, job.owner_id, job.name, job.row_num, job.pack_json,
+                next_attempt=time.time() + RETRY_BASE_DELAY, last_error=job.failure,
+            ))
+            metrics.set("poolbot_retry_queue_depth", self.retries.count(self.retry_queue), queue=self.retry_queue)
+            self._retries_waiting.set()
+        if not job.done.done():
+            job.done.set_result(job.tracked)
+
+    async def _drain_retries(self):
+        """Resubmit queued packs as they come due, one at a time and no faster than the retry bucket allows."""
+        while True:
+            entry = self.retries.next(self.retry_queue)
+            if entry is None:
+                self._retries_waiting.clear()
+                await self._retries_waiting.wait()
+                continue
+            delay = entry.next_attempt - time.time()
+            if delay > 0:
+                self._retries_waiting.clear()
+                try:
+                    await wait_for(self._retries_waiting.wait(), delay)
+                except TimeoutError:
+                    pass
+                continue
+            await self.retry_bucket.acquire()
+            await self._retry(entry)
+            metrics.set("poolbot_retry_queue_depth", self.retries.count(self.retry_queue), queue=self.retry_queue)
+
+    async def _retry(self, entry: RetryEntry):
+        metrics.inc("poolbot_retries_total", operation="track_pack")
+        job = PackJob(
+            None, get_running_loop().create_future(), entry.owner_id, entry.name, entry.row_num, entry.pack_json,
+            retry=entry,
+        )
+        try:
+            if entry.stage == "owner":
+                job.message = await self.packs_channel.fetch_message(entry.message_id)
+        except discord.NotFound:
+            print(f"pool tracker error — retrying pack {entry.message_id}: message was deleted")
+            self.retries.remove(self.retry_queue, entry.message_id)
+            return
+        except discord.HTTPException as e:
+            job.failure = f"fetching message: {e}"
+        else:
+            await self._submit(job, entry.stage)
+            await job.done
+
+        if job.tracked or job.failure is None:
+            # Either tracked, or failed for a reason retrying won't fix (and has already been reported)
+            self.retries.remove(self.retry_queue, entry.message_id)
+            return
+        entry.attempts += 1
+        entry.last_error = job.failure
+        if entry.attempts >= self.retry_max_attempts:
+            print(f"pool tracker error — giving up on pack {entry.message_id} after {entry.attempts} retries: {job.failure}")
+            metrics.inc("poolbot_tracking_give_ups_total")
+            self.retries.remove(self.retry_queue, entry.message_id)
+            await self.set_cell_to_red(entry.row_num, 'G')
+            return
+        # Exponential backoff with some jitter, so entries that failed together don't all come due together
+        delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (entry.attempts - 1)) * random.uniform(0.5, 1)
+        entry.next_attempt = time.time() + delay
+        self.retries.add(self.retry_queue, entry)
+        # The service this pack needs is probably still down, so hold the rest of the queue back too
+        self.retries.defer(self.retry_queue, entry.next_attempt)
+
+    async def write_pack(self, name: str, new_pack_id: str, updated_pool_id: str):
+        await self.queue_pack(name, new_pack_id, updated_pool_id)
+
+    def queue_pack(self, name: str, new_pack_id: str, updated_pool_id: str) -> Future[None]:
+        """Queue a pack's Pool Changes row. The future resolves once it's written, or raises SpreadsheetError."""
+        pack_rows = [
+            [datetime.now().isoformat(),name,"add pack",new_pack_id,"",updated_pool_id],
+        ]
+        # Appends from concurrent packs are batched into a single request
+        written = self.writes.append('Pool Changes!A:D', pack_rows)
+        # Added first, so the pool ID is recorded before anyone waiting on the write hears it's done
+        written.add_done_callback(lambda _: self._record_pool_id(name, updated_pool_id, written))
+        return written
+
+    def _record_pool_id(self, name: str, updated_pool_id: str, written: Future[None]):
+        if not written.cancelled() and written.exception() is None:
+            self.pool_ids.record(name, updated_pool_id)
 
     async def set_cell_to_red(self, row: int, col: str):
-        await set_cell_to_red(self.sheet, self.spreadsheet_id, self.tab_id, row, col)
+        metrics.inc("poolbot_red_cells_total")
+        try:
+            await set_cell_to_red(self.writes, self.tab_id, row, col)
+        except SpreadsheetError as e:
+            metrics.inc("poolbot_red_cell_errors_total")
+            print(f"spreadsheet error — setting cell to red: {e}")
+
+class PackOptionIndex:
+    """
+    IDs of pack option messages waiting on a player's choice, keyed by user ID and option letter. The index is saved
+    to a JSON file on every change so pending choices survive a restart.
+    """
+    def __init__(self, path: str = PACK_OPTIONS_PATH):
+        self.path = path
+        self._message_ids: dict[str, int] = {}
+        # Options posted before there was an index file have to be found in the channel, once
+        self.needs_migration = not os.path.exists(path)
+        if not self.needs_migration:
+            with open(path) as file:
+                self._message_ids = json.load(file)
+
+    async def migrate(self, channel: discord.TextChannel, bot_name: str, limit: int = PACK_OPTIONS_MIGRATION_LIMIT):
+        """
+        Record the options still waiting on a choice among the channel's last `limit` messages, if the index is new.
+        Options recorded meanwhile are kept. Raises discord.HTTPException.
+        """
+        if not self.needs_migration:
+            return
+        found: dict[str, int] = {}
+        # Newest first, so an older option doesn't replace a newer one for the same player
+        async for message in channel.history(limit=limit):
+            option = re.match(r"Pack Option ([A-Z]) for", message.content)
+            if message.author.name == bot_name and message.mentions and option:
+                found.setdefault(self._key(message.mentions[0].id, option.group(1)), message.id)
+        self._message_ids = {**found, **self._message_ids}
+        self._save()
+        self.needs_migration = False
+
+    @staticmethod
+    def _key(user_id: int, option: str) -> str:
+        return f"{user_id}:{option}"
+
+    def _save(self):
+        write_file_atomically(self.path, json.dumps(self._message_ids))
+
+    def record(self, user_id: int, option: str, message_id: int):
+        self._message_ids[self._key(user_id, option)] = message_id
+        self._save()
+
+    def get(self, user_id: int, option: str) -> Optional[int]:
+        return self._message_ids.get(self._key(user_id, option))
+
+    def remove(self, user_id: int, *options: str):
+        for option in options:
+            self._message_ids.pop(self._key(user_id, option), None)
+        self._save()
+
+@dataclass
+class BoosterRequest:
+    """A !playerchoice waiting on Booster Tutor to generate its pack options."""
+    user: Union[discord.Member, discord.User]
+    # Resolves once every option has been posted
+    done: Future[None]
+    remaining: int = 0
+
+@dataclass
+class BoosterSlot:
+    """One pack command sent to Booster Tutor, waiting for its reply."""
+    request: BoosterRequest
+    option: str
+    # Unknown until the command has been sent
+    command_id: Optional[int] = None
+
+class BoosterRequests:
+    """
+    Matches Booster Tutor's pack generation replies to the !playerchoice requests that asked for them. Every pack
+    command sent takes a slot in a FIFO. A reply that references its command fills that command's slot, and a reply
+    without a reference fills the oldest slot, since Booster Tutor answers commands in the order it receives them. A
+    reply to a command with no slot, e.g. one whose request timed out, is dropped.
+    """
+    def __init__(self, channel: discord.TextChannel):
+        self.channel = channel
+        self._slots: list[BoosterSlot] = []
+        # Keeps each request's commands next to each other in the channel
+        self._send_lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    async def request(self, user: Union[discord.Member, discord.User], booster_types: Sequence[str]) -> BoosterRequest:
+        """Ask Booster Tutor for one pack per booster type, lettered A, B, ... in order."""
+        request = BoosterRequest(user, get_running_loop().create_future(), len(booster_types))
+        async with self._send_lock:
+            for option, booster_type in zip("ABCDEFGH", booster_types):
+                # The slot exists before the command is sent, so even an immediate reply finds it
+                slot = BoosterSlot(request, option)
+                self._slots.append(slot)
+                try:
+                    command = await self.channel.send(booster_type)
+                except Exception:
+                    self.cancel(request)
+                    raise
+                slot.command_id = command.id
+        return request
+
+    def match(self, message: discord.Message) -> Optional[BoosterSlot]:
+        """Take the slot a Booster Tutor reply belongs to, or None if nothing is waiting on it."""
+        ref_id = message.reference and message.reference.message_id
+        if not ref_id:
+            return self._slots.pop(0) if self._slots else None
+        slot = next((slot for slot in self._slots if slot.command_id == ref_id), None)
+        if slot is None:
+            # A reply that beat `send` returning references the command still being sent, whose ID isn't known yet
+            slot = next((slot for slot in self._slots if slot.command_id is None), None)
+        if slot is not None:
+            self._slots.remove(slot)
+        return slot
+
+    def complete(self, slot: BoosterSlot):
+        slot.request.remaining -= 1
+        if slot.request.remaining == 0 and not slot.request.done.done():
+            slot.request.done.set_result(None)
+
+    def cancel(self, request: BoosterRequest):
+        """Stop waiting on a request's outstanding packs."""
+        self._slots = [slot for slot in self._slots if slot.request is not request]
+        if not request.done.done():
+            request.done.cancel()
+
+@dataclass
+class LfmEntry:
+    user: Union[discord.User, discord.Member]
+    hero_score: float
+    # The anonymous post made for the player
+    message: discord.Message
+    # Orders entries by when they were posted
+    seq: int
+    # Event loop time the LFM expires at
+    expires: float
+    timer: Optional[Task] = None
 
 class Matchmaker():
+    """
+    Anonymous LFMs waiting for a `!challenge`, any number at once but one per player. A challenge is paired with
+    either the oldest LFM or the one whose player's hero score is closest to the challenger's, depending on `pairing`.
+    Entries are indexed by age and by hero score in sorted lists, so either lookup is a bisection. Adding or removing
+    an entry shifts the lists along, which costs nothing to speak of at the few dozen LFMs a league has open at once,
+    and closest-score pairing needs the neighbours a heap wouldn't give. An LFM nobody challenges is withdrawn after
+    `timeout` seconds.
+    """
+    PAIRINGS = ("oldest", "closest")
+
     def __init__(
         self,
-        sheet: Any,
+        players: PlayerDirectory,
         command: str,
         what_it_is: str,
         channel: discord.TextChannel,
-        spreadsheet_id: str,
-        player_database_tab_id: str,
         extra=None,
+        pairing: str = LFM_PAIRING,
+        timeout: float = LFM_TIMEOUT,
     ):
-        self.sheet = sheet
+        if pairing not in self.PAIRINGS:
+            raise ValueError(f"Unknown LFM pairing {pairing!r}, expected one of {', '.join(self.PAIRINGS)}")
+        self.players = players
         self.command = command
         self.what_it_is = what_it_is
         self.channel = channel
-        self.spreadsheet_id = spreadsheet_id
-        self.player_database_tab_id = player_database_tab_id
         self.extra = extra
-        self.pending_user_mention: Optional[str] = None
-        self.pending_user_id: Optional[int] = None
-        self.active_message: Optional[discord.Message] = None
-        self._player_database_tab_name: Optional[str] = None
-
-    async def _fetch_player_data(self) -> list[PlayerDatabaseRow]:
-        if self._player_database_tab_name is None:
-            self._player_database_tab_name = await get_sheet_title_by_id(
-                self.sheet, self.spreadsheet_id, self.player_database_tab_id
+        self.pairing = pairing
+        self.timeout = timeout
+        self._entries: dict[int, LfmEntry] = {}
+        # (seq, user ID), oldest first
+        self._by_age: list[Tuple[int, int]] = []
+        # (hero score, seq, user ID), lowest score first
+        self._by_score: list[Tuple[float, int, int]] = []
+        self._next_seq = 0
+        # Players whose post is being made, so a second !lfm sent meanwhile is turned away
+        self._posting: set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def waiting(self, user_id: int) -> bool:
+        return user_id in self._entries
+
+    def _add(self, entry: LfmEntry):
+        user_id = entry.user.id
+        self._entries[user_id] = entry
+        insort(self._by_age, (entry.seq, user_id))
+        insort(self._by_score, (entry.hero_score, entry.seq, user_id))
+        entry.timer = create_task(self._expire(entry))
+        metrics.set("poolbot_lfm_waiting", len(self), command=self.command)
+
+    def _remove(self, user_id: int) -> Optional[LfmEntry]:
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return None
+        del self._by_age[bisect_left(self._by_age, (entry.seq, user_id))]
+        del self._by_score[bisect_left(self._by_score, (entry.hero_score, entry.seq, user_id))]
+        if entry.timer is not None:
+            entry.timer.cancel()
+            entry.timer = None
+        metrics.set("poolbot_lfm_waiting", len(self), command=self.command)
+        return entry
+
+    def _take(self, challenger_id: int, challenger_score: float) -> Optional[LfmEntry]:
+        """
+        Remove and return the LFM the challenger is paired with, never their own. This doesn't await, so challenges
+        handled at the same time can't be paired with the same LFM.
+        """
+        if self.pairing == "oldest":
+            user_id = next((user_id for _, user_id in self._by_age[:2] if user_id != challenger_id), None)
+        else:
+            # The closest scores either side of the challenger's, stepping past their own LFM if it's in the way
+            i = bisect_left(self._by_score, (challenger_score,))
+            candidates = [
+                (abs(score - challenger_score), seq, user_id)
+                for score, seq, user_id in self._by_score[max(i - 2, 0):i + 2]
+                if user_id != challenger_id
+            ]
+            user_id = min(candidates)[2] if candidates else None
+        return self._remove(user_id) if user_id is not None else None
+
+    async def _expire(self, entry: LfmEntry):
+        await sleep(max(entry.expires - get_running_loop().time(), 0))
+        if self._entries.get(entry.user.id) is not entry:
+            return
+        # Removing the entry would cancel this task
+        entry.timer = None
+        self._remove(entry.user.id)
+        await update_message(entry.message, f"~~{entry.message.content}~~\nThis LFM has expired.")
+        try:
+            await entry.user.send(
+                f"Nobody challenged your post in {self.channel.jump_url}, so I've taken it down. Send me "
+                f"`{self.command}` again if you're still looking for {self.what_it_is}."
             )
-        tab_name = self._player_database_tab_name.replace("'", "''")
-        player_range = f"'{tab_name}'!A2:AE"
-        raw_player_data = await get_spreadsheet_values(
-            self.sheet, self.spreadsheet_id, player_range
-        )
-        return [p for p in (parse_player_row(r) for r in raw_player_data) if p is not None]
+        except discord.HTTPException as e:
+            print(f"Failed to tell {entry.user.id} their LFM expired: {e}")
+
+    def stop(self):
+        """Stop the expiry timers. The LFMs stay queued."""
+        for entry in self._entries.values():
+            if entry.timer is not None:
+                entry.timer.cancel()
+                entry.timer = None
 
     async def issue_challenge(self, message: discord.Message):
-        """Handle challenge command. Early returns if no pending user or active message."""
-        if not self.pending_user_mention:
+        """Pair the challenger with a waiting LFM and announce the match."""
+        if not self._entries.keys() - {message.author.id}:
             await self.channel.send(
                 f"Sorry, but no one is looking for {self.what_it_is} right now. You can send out an anonymous LFM by DMing me "
                 f"`{self.command}`. "
             )
             return
-        if self.active_message is None:
-            return  # Shouldn't happen if pending_user_mention is set, but guard anyway
         async with self.channel.typing():
             try:
-                player_data = await self._fetch_player_data()
+                await self.players.load()
             except SpreadsheetError as e:
                 print(f"spreadsheet error — fetching player data for matchmaking: {e}")
                 await self.channel.send(
@@ -503,17 +2418,20 @@ class Matchmaker():
                 )
                 return
 
-            def get_player(discord_id: Optional[int]) -> Optional[PlayerDatabaseRow]:
-                if discord_id is None:
-                    return None
-                return next((p for p in player_data if p["discord_id"] == discord_id), None)
-
-            pending_player = get_player(self.pending_user_id)
-            challenger_player = get_player(message.author.id)
-            pending_score = pending_player["hero_score"] if pending_player else 0.0
+            _, challenger_player = self.players.get(message.author.id)
             challenger_score = challenger_player["hero_score"] if challenger_player else 0.0
+            entry = self._take(message.author.id, challenger_score)
+            if entry is None:
+                # Other challenges took every LFM while the player data was loading
+                await self.channel.send(
+                    f"Sorry, but everyone looking for {self.what_it_is} has just been challenged. You can send out an "
+                    f"anonymous LFM by DMing me `{self.command}`. "
+                )
+                return
+            _, pending_player = self.players.get(entry.user.id)
+            pending_score = pending_player["hero_score"] if pending_player else 0.0
             match_announcement = format_match_announcement(
-                self.pending_user_mention or "LFM player",
+                entry.user.mention,
                 pending_score,
                 message.author.mention,
                 challenger_score,
@@ -524,59 +2442,117 @@ class Matchmaker():
                 await self.channel.send(f"{match_announcement}{overall_extra}")
             except Exception as e:
                 print(f"Failed to send match announcement: {e}, keeping player pending")
-                # State remains intact, player stays pending
+                if entry.user.id in self._entries or entry.user.id in self._posting:
+                    # They sent a new !lfm while this one was taken, and that replaces it
+                    await update_message(entry.message, f"~~{entry.message.content}~~\nThis LFM has been replaced.")
+                else:
+                    # Back in its original place in the queue
+                    self._add(entry)
                 return
 
-            # Announcement sent - match is complete. Update old post is cosmetic.
-            await update_message(
-                self.active_message,
-                f'~~{self.active_message.content}~~\n'
-                f'A match was found!'
-            )
-
-            # Clear state - match is done regardless of whether update_message succeeded
-            self.pending_user_mention = None
-            self.pending_user_id = None
-            self.active_message = None
+            # Announcement sent - match is complete. Updating the posts is cosmetic.
+            # The challenger's own LFM, if they had one, isn't needed anymore either
+            own_entry = self._remove(message.author.id)
+            for matched in (entry, own_entry):
+                if matched is not None:
+                    await update_message(matched.message, f'~~{matched.message.content}~~\nA match was found!')
 
     async def handle_command(self, message: discord.Message, argument: str):
-        if self.pending_user_mention:
+        user_id = message.author.id
+        if user_id in self._entries or user_id in self._posting:
             await message.author.send(
-                f"Someone is already looking for {self.what_it_is}. You can play them by posting `!challenge` in {self.channel.jump_url}"
+                f"You're already looking for {self.what_it_is}. If you want to cancel that, send me a message with the "
+                f"text `!nvm`."
             )
             return
-        if not argument:
-            self.active_message = await self.channel.send(
-                f"An anonymous player is looking for {self.what_it_is}. Post `!challenge` to reveal their identity and "
-                f"initiate {self.what_it_is}. "
-            )
-        else:
-            self.active_message = await self.channel.send(
-                f"An anonymous player is looking for {self.what_it_is}. Post `!challenge` to reveal their identity and "
-                f"initiate {self.what_it_is}.\n "
-                f"Message from the player:\n"
-                f"> {argument}"
-            )
-        active_message = self.active_message
+        self._posting.add(user_id)
+        try:
+            hero_score = 0.0
+            try:
+                _, player = await self.players.lookup(user_id)
+                hero_score = player["hero_score"] if player else 0.0
+            except SpreadsheetError as e:
+                # Only closest-score pairing needs it, and that can make do
+                print(f"spreadsheet error — fetching hero score for LFM: {e}")
+            if not argument:
+                active_message = await self.channel.send(
+                    f"An anonymous player is looking for {self.what_it_is}. Post `!challenge` to reveal their identity and "
+                    f"initiate {self.what_it_is}. "
+                )
+            else:
+                active_message = await self.channel.send(
+                    f"An anonymous player is looking for {self.what_it_is}. Post `!challenge` to reveal their identity and "
+                    f"initiate {self.what_it_is}.\n "
+                    f"Message from the player:\n"
+                    f"> {argument}"
+                )
+            self._add(LfmEntry(
+                message.author, hero_score, active_message, self._next_seq, get_running_loop().time() + self.timeout
+            ))
+            self._next_seq += 1
+        finally:
+            self._posting.discard(user_id)
         await message.author.send(
             f"I've created a post for you: {active_message.jump_url}\n"
             "You'll receive a mention when an opponent is found.\n"
             f"If you want to cancel this, send me a message with the text `!nvm`."
         )
-        self.pending_user_mention = message.author.mention
-        self.pending_user_id = int(message.author.id)
 
     async def handle_retract(self, message: discord.Message) -> bool:
-        if message.author.mention == self.pending_user_mention and self.active_message is not None:
-            await self.active_message.delete()
-            self.active_message = None
-            await message.author.send(
-                f"Understood. The post made on your behalf in {self.channel.jump_url} has been deleted."
-            )
-            self.pending_user_mention = None
-            self.pending_user_id = None
-            return True
-        return False
+        entry = self._remove(message.author.id)
+        if entry is None:
+            return False
+        try:
+            await entry.message.delete()
+        except discord.HTTPException as e:
+            print(f"Failed to delete LFM post: {e}")
+        await message.author.send(
+            f"Understood. The post made on your behalf in {self.channel.jump_url} has been deleted."
+        )
+        return True
+
+class RoleIndex:
+    """
+    Which (non-bot) members hold each role, by role name. Built from the guild's member cache once and kept current
+    from member events, so questions like "who doesn't have a league role" don't have to walk every member's roles.
+    """
+    def __init__(self):
+        self.members_by_role: defaultdict[str, set[int]] = defaultdict(set)
+        self.roles_by_member: dict[int, set[str]] = {}
+
+    def rebuild(self, members: Iterable[discord.Member]):
+        self.members_by_role = defaultdict(set)
+        self.roles_by_member = {}
+        for member in members:
+            self.add(member)
+
+    def add(self, member: discord.Member):
+        if member.bot:
+            return
+        role_names = {role.name for role in member.roles}
+        self.roles_by_member[member.id] = role_names
+        for role_name in role_names:
+            self.members_by_role[role_name].add(member.id)
+
+    def remove(self, member_id: int):
+        for role_name in self.roles_by_member.pop(member_id, set()):
+            members = self.members_by_role[role_name]
+            members.discard(member_id)
+            if not members:
+                del self.members_by_role[role_name]
+
+    def update(self, member: discord.Member):
+        self.remove(member.id)
+        self.add(member)
+
+    def members_with_role_matching(self, fragment: str) -> set[int]:
+        """IDs of members holding any role whose name contains `fragment`."""
+        matching = [members for role_name, members in self.members_by_role.items() if fragment in role_name]
+        return set().union(*matching)
+
+    def members_lacking_role_matching(self, fragment: str) -> set[int]:
+        """IDs of members holding no role whose name contains `fragment`."""
+        return self.roles_by_member.keys() - self.members_with_role_matching(fragment)
 
 def has_pack(message: discord.Message) -> bool:
     """Check if message contains pack data. Raises IndexError if no embeds."""
@@ -585,12 +2561,119 @@ def has_pack(message: discord.Message) -> bool:
     has_field = any(f.name == "SealedDeck.Tech ID" for f in embed.fields)
     return has_code_block or has_field
 
+
+class EventRecorder:
+    """
+    Writes the gateway events PoolBot acts on to a JSONL file that replay.py can play back. The events are Booster
+    Tutor messages and edits, DMs, and commands. User and message IDs are replaced with pseudonyms that are stable
+    within a recording but can't be traced back, since the key is never stored.
+
+    The pseudonyms and times only mean anything within one process, so each run writes its own recording, named after
+    `path` with the time it started and the process ID, e.g. events-20240101T120000-4242.jsonl for events.jsonl.
+    """
+    MENTION_RE = re.compile(r"<@!?(\d+)>")
+
+    def __init__(self, path: str):
+        stem, extension = os.path.splitext(path)
+        self.path = f"{stem}-{datetime.now().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}{extension}"
+        self.file = open(self.path, "x", buffering=1)
+        print(f"Recording events to {self.path}")
+        self.started = time.monotonic()
+        self._key = os.urandom(16)
+        self._channels: dict[int, str] = {}
+        self._users: dict[int, str] = {}
+        self._message_ids: dict[int, int] = {}
+
+    def name_channel(self, channel_id: int, name: str):
+        self._channels[channel_id] = name
+
+    def name_user(self, user_id: int, name: str):
+        """Record a well-known user (the bot itself, Booster Tutor) by name rather than pseudonym."""
+        self._users[user_id] = name
+
+    def _user(self, user_id: int) -> Union[int, str]:
+        if user_id in self._users:
+            return self._users[user_id]
+        digest = hashlib.blake2b(user_id.to_bytes(8, "big"), key=self._key, digest_size=6).digest()
+        return int.from_bytes(digest, "big")
+
+    def _message_id(self, message_id: int) -> int:
+        return self._message_ids.setdefault(message_id, len(self._message_ids) + 1)
+
+    def _text(self, text: Optional[str]) -> Optional[str]:
+        if text is None:
+            return None
+        return self.MENTION_RE.sub(lambda match: f"<@{self._user(int(match.group(1)))}>", text)
+
+    def _message(self, message: discord.Message) -> dict[str, Any]:
+        if not message.guild:
+            channel = "dm"
+        else:
+            channel = self._channels.get(message.channel.id, "other")
+        return {
+            "id": self._message_id(message.id),
+            "channel": channel,
+            "author": self._user(message.author.id),
+            "content": self._text(message.content),
+            "embeds": [{
+                "description": self._text(embed.description),
+                "fields": [[embed_field.name, self._text(embed_field.value)] for embed_field in embed.fields],
+            } for embed in message.embeds],
+            "mentions": [self._user(user.id) for user in message.mentions],
+            "reference": self._message_id(message.reference.message_id)
+                if message.reference and message.reference.message_id else None,
+        }
+
+    def wants(self, message: discord.Message) -> bool:
+        author = self._users.get(message.author.id)
+        if author == "bot":
+            return False
+        return author == "booster_tutor" or not message.guild or message.content.startswith("!")
+
+    def record(self, event: str, message: discord.Message, before: Optional[discord.Message] = None):
+        if not self.wants(message):
+            return
+        record: dict[str, Any] = {"t": round(time.monotonic() - self.started, 3), "event": event}
+        if before is not None:
+            record["before"] = self._message(before)
+        record["message"] = self._message(message)
+        self.file.write(json.dumps(record) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
 class PoolBot(discord.Client):
     def __init__(self, config: utils.Config, intents: discord.Intents, *args, **kwargs):
         self.config = config
         self.league_start = datetime.fromisoformat('2022-06-22')
+        self.roles = RoleIndex()
+        self.recorder = EventRecorder(config.record_events_path) if config.record_events_path else None
+        self.booster_tutor: Optional[discord.User] = None
+        self._setup_lock = Lock()
+        self._set_up = False
         super().__init__(intents=intents, *args, **kwargs)
 
+    async def setup_hook(self):
+        # One pooled session for all sealeddeck.tech traffic, so requests reuse keep-alive connections
+        self.sealeddeck_session = new_sealeddeck_session(
+            self.config.sealeddeck_max_connections or SEALEDDECK_MAX_CONNECTIONS
+        )
+        # Shared by every broadcast so that concurrent ones still respect Discord's DM rate limits together
+        self.dm_bucket = TokenBucket(
+            self.config.broadcast_rate or BROADCAST_RATE, self.config.broadcast_burst or BROADCAST_BURST
+        )
+        self.broadcast_concurrency = self.config.broadcast_concurrency or BROADCAST_CONCURRENCY
+        self.pool_cache = PoolCache(
+            self.config.pool_cache_path or POOL_CACHE_PATH,
+            self.config.pool_cache_max_bytes or POOL_CACHE_MAX_BYTES,
+        )
+        # Packs whose tracking failed because sealeddeck.tech or Sheets did, waiting to be tried again
+        self.retry_queue = RetryQueue(self.config.retry_queue_path or RETRY_QUEUE_PATH)
+        self.metrics_server: Optional[web.AppRunner] = None
+        if self.config.metrics_port:
+            self.metrics_server = await start_metrics_server(metrics, self.config.metrics_port)
+
     def _get_channel(self, channel_id: int) -> discord.TextChannel:
         """Get a channel by ID, validating it exists and is a TextChannel. Raises on failure."""
         channel = self.get_channel(channel_id)
@@ -598,12 +2681,55 @@ class PoolBot(discord.Client):
             raise RuntimeError(f"Required channel {channel_id} not found or is not a TextChannel")
         return channel
 
+    def _new_write_buffer(self, spreadsheet_id: str) -> SheetWriteBuffer:
+        return SheetWriteBuffer(
+            self.sheet,
+            spreadsheet_id,
+            self.config.sheet_flush_interval or SHEET_FLUSH_INTERVAL,
+            self.config.sheet_flush_max_pending or SHEET_FLUSH_MAX_PENDING,
+        )
+
+    def _new_pool_tracker(self, writes: SheetWriteBuffer, players: PlayerDirectory, packs_channel: discord.TextChannel, spreadsheet_id: str) -> PoolTracker:
+        return PoolTracker(
+            self.sheet,
+            writes,
+            self.sealeddeck_session,
+            self.pool_cache,
+            self.retry_queue,
+            players,
+            self.pool_channel,
+            packs_channel,
+            spreadsheet_id,
+            self.pools_tab_id,
+            reconcile_interval=self.config.pool_id_reconcile_interval or POOL_ID_RECONCILE_INTERVAL,
+            max_concurrency=self.config.pool_tracker_concurrency or POOL_TRACKER_CONCURRENCY,
+            workers=self.config.pack_pipeline_workers,
+            queue_size=self.config.pack_pipeline_queue_size or PACK_PIPELINE_QUEUE_SIZE,
+            retry_max_attempts=self.config.retry_max_attempts or RETRY_MAX_ATTEMPTS,
+            retry_drain_rate=self.config.retry_drain_rate or RETRY_DRAIN_RATE,
+            pool_store=PoolStore(
+                self.config.pool_store_path or POOL_STORE_PATH,
+                spreadsheet_id,
+                self.sealeddeck_session,
+                self.pool_cache,
+                self.config.pool_store_snapshot_every or POOL_STORE_SNAPSHOT_EVERY,
+                self.config.sealeddeck_fetch_concurrency or SEALEDDECK_FETCH_CONCURRENCY,
+            ),
+        )
+
     async def on_ready(self):
         print(f'{self.user} has connected to Discord!')
-        if not self.config.skip_username and self.user is not None:
-            result = await self.user.edit(username=self.config.bot_name)
-            if result is None:
-                raise RuntimeError("Failed to update bot username")
+        # on_ready fires again whenever the gateway session has to be re-established. Everything built here survives
+        # that, so only the first call does the full setup.
+        async with self._setup_lock:
+            if not self._set_up:
+                await self.set_up()
+                self._set_up = True
+                return
+        await self.reconnected()
+
+    async def set_up(self):
+        """One-time startup: find channels and users, connect to Sheets, and start the pool trackers."""
         # If this is true, posts will be limited to #bot-lab and #bot-bunker, and LFM DMs will be ignored.
         self.dev_mode = self.config.debug_mode == "active"
         self.pools_tab_id = self.config.pools_tab_id
@@ -616,29 +2742,34 @@ class PoolBot(discord.Client):
         self.bot_bunker_channel = self._get_channel(self.config.bot_bunker_channel_id)
         self.league_committee_channel = self._get_channel(self.config.league_committee_channel_id)
         self.side_quest_pools_channel = self._get_channel(self.config.side_quest_pools_channel_id)
-        self.num_boosters_awaiting = 0
-        self.awaiting_boosters_for_user: Optional[Union[discord.Member, discord.User]] = None
+        self.pack_options = PackOptionIndex(self.config.pack_options_path or PACK_OPTIONS_PATH)
+        self.booster_requests = BoosterRequests(self.bot_bunker_channel)
+        self.roles.rebuild(self.guilds[0].members)
         self.spreadsheet_id = self.config.spreadsheet_id
 
-        # Get sheet client first - fail fast if it fails
-        self.sheet = await get_sheet_client()
-
-        # Pass sheet to PoolTracker - explicit dependencies
-        self.pool_tracker = PoolTracker(self.sheet, self.pool_channel, self.packs_channel, self.spreadsheet_id, self.pools_tab_id)
-        self.second_pool_tracker: Optional[PoolTracker] = PoolTracker(self.sheet, self.pool_channel, self.second_packs_channel, self.config.second_spreadsheet_id, self.pools_tab_id) if self.config.second_spreadsheet_id else None
-
-        self.matchmaker = Matchmaker(
-            self.sheet,
-            "!lfm",
-            "a match",
-            self.lfm_channel,
-            self.spreadsheet_id,
-            self.config.player_database_tab_id,
+        # None of these depend on each other. The sheet client fails fast if it can't connect.
+        sheet, self.booster_tutor, _, _ = await gather(
+            get_sheet_client(
+                self.config.sheets_max_workers or SHEETS_MAX_WORKERS,
+                self.config.token_refresh_margin or TOKEN_REFRESH_MARGIN,
+            ),
+            self._find_booster_tutor(),
+            self._update_username(),
+            self._migrate_pack_options(),
         )
-        self.matchmakers = [self.matchmaker]
-        for user in self.users:
-            if user.name == 'Booster Tutor':
-                self.booster_tutor = user
+        await self.start_services(sheet)
+
+        if self.recorder is not None:
+            for name, channel in (
+                    ("pool", self.pool_channel), ("packs", self.packs_channel),
+                    ("second-packs", self.second_packs_channel), ("lfm", self.lfm_channel),
+                    ("bot-bunker", self.bot_bunker_channel), ("league-committee", self.league_committee_channel),
+                    ("side-quest-pools", self.side_quest_pools_channel)):
+                self.recorder.name_channel(channel.id, name)
+            if self.user is not None:
+                self.recorder.name_user(self.user.id, "bot")
+            if self.booster_tutor is not None:
+                self.recorder.name_user(self.booster_tutor.id, "booster_tutor")
         #
         # for member in self.guilds[0].members:
         #     if member.bot:
@@ -650,7 +2781,103 @@ class PoolBot(discord.Client):
         #             time.sleep(0.5)
         # await self.message_members_not_in_league("Wilds")
 
+    async def start_services(self, sheet: SheetsClient):
+        """Build everything that talks to the spreadsheets, start the pool trackers, and warm their caches."""
+        self.sheet = sheet
+        self.writes = self._new_write_buffer(self.spreadsheet_id)
+
+        # One shared copy of each spreadsheet's Player Database
+        player_directory_ttl = self.config.player_directory_ttl or PLAYER_DIRECTORY_TTL
+        self.players = PlayerDirectory(self.sheet, self.spreadsheet_id, self.config.player_database_tab_id, player_directory_ttl)
+
+        self.pools = PoolsIndex(self.sheet, self.spreadsheet_id, self.players, self.config.pools_index_ttl or POOLS_INDEX_TTL)
+        # !explore commands are rare enough to handle one at a time, so two can't spend the same map
+        self.explore_lock = Lock()
+
+        # Pass sheet to PoolTracker - explicit dependencies
+        self.pool_tracker = self._new_pool_tracker(self.writes, self.players, self.packs_channel, self.spreadsheet_id)
+        self.second_pool_tracker: Optional[PoolTracker] = self._new_pool_tracker(self._new_write_buffer(self.config.second_spreadsheet_id), PlayerDirectory(self.sheet, self.config.second_spreadsheet_id, ttl=player_directory_ttl), self.second_packs_channel, self.config.second_spreadsheet_id) if self.config.second_spreadsheet_id else None
+        self.matchmaker = Matchmaker(
+            self.players,
+            "!lfm",
+            "a match",
+            self.lfm_channel,
+            pairing=self.config.lfm_pairing or LFM_PAIRING,
+            timeout=self.config.lfm_timeout or LFM_TIMEOUT,
+        )
+        self.matchmakers = [self.matchmaker]
+
+        # Load up front, all at once, what the first packs and commands would otherwise wait on. That includes
+        # resolving the Player Database tab titles.
+        loads: list[Tuple[str, Awaitable[None]]] = [("player data", self.players.load()), ("pools", self.pools.load())]
+        for tracker in (self.pool_tracker, self.second_pool_tracker):
+            if tracker is None:
+                continue
+            tracker.start()
+            loads.append(("pool changes", tracker.pool_ids.refresh()))
+            if tracker.players is not self.players:
+                loads.append(("player data", tracker.players.load()))
+        results = await gather(*(load for _, load in loads), return_exceptions=True)
+        for (what, _), result in zip(loads, results):
+            if isinstance(result, SpreadsheetError):
+                # Not fatal - each of these is retried when it's first needed
+                print(f"spreadsheet error — loading {what}: {result}")
+            elif isinstance(result, BaseException):
+                raise result
+
+    async def reconnected(self):
+        """Catch up on what may have changed while disconnected, keeping trackers, caches and pending LFMs."""
+        self.roles.rebuild(self.guilds[0].members)
+        if self.booster_tutor is None:
+            self.booster_tutor = await self._find_booster_tutor()
+
+    async def _update_username(self):
+        if self.config.skip_username or self.user is None or self.user.name == self.config.bot_name:
+            return
+        result = await self.user.edit(username=self.config.bot_name)
+        if result is None:
+            raise RuntimeError("Failed to update bot username")
+
+    async def _migrate_pack_options(self):
+        try:
+            await self.pack_options.migrate(self.packs_channel, self.config.bot_name)
+        except discord.HTTPException as e:
+            print(f"discord error — finding pending pack options: {e}")
+
+    async def _find_booster_tutor(self) -> Optional[discord.User]:
+        """Booster Tutor by its configured ID, or failing that, by name."""
+        if self.config.booster_tutor_id:
+            user = self.get_user(self.config.booster_tutor_id)
+            if user is None:
+                try:
+                    user = await self.fetch_user(self.config.booster_tutor_id)
+                except discord.HTTPException as e:
+                    print(f"discord error — fetching Booster Tutor: {e}")
+            if user is not None:
+                return user
+        return discord.utils.get(self.users, name='Booster Tutor')
+
+    async def on_member_join(self, member: discord.Member):
+        self.roles.add(member)
+
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        self.roles.update(after)
+
+    async def on_member_remove(self, member: discord.Member):
+        self.roles.remove(member.id)
+
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+        if before.name != after.name:
+            self.roles.rebuild(after.guild.members)
+
+    def members_not_in_league(self, league_name: str) -> list[discord.Member]:
+        guild = self.guilds[0]
+        members = (guild.get_member(member_id) for member_id in self.roles.members_lacking_role_matching(league_name))
+        return sorted((member for member in members if member is not None), key=lambda member: member.display_name)
+
     async def on_message_edit(self, before: discord.Message, after: discord.Message):
+        if self.recorder is not None:
+            self.recorder.record("message_edit", after, before)
         # Booster tutor adds sealeddeck.tech links as part of an edit operation
         if before.author == self.booster_tutor:
             if before.channel == self.pool_channel and "SealedDeck.Tech link" not in before.content and\
@@ -668,6 +2895,8 @@ class PoolBot(discord.Client):
                 return
 
     async def on_message(self, message: discord.Message):
+        if self.recorder is not None:
+            self.recorder.record("message", message)
         # As part of the !playerchoice flow, repost Booster Tutor packs in pack-generation with instructions for
         # the appropriate user to select their pack.
         if (message.channel == self.bot_bunker_channel and message.author == self.booster_tutor
@@ -696,6 +2925,8 @@ class PoolBot(discord.Client):
             argument = message.content.split('"')[1]
         elif ' ' in message.content:
             argument = argv[1]
+        if command.startswith('!'):
+            metrics.inc("poolbot_commands_total", command=command if command in COUNTED_COMMANDS else "other")
 
         if not message.guild:
             # For now, only allow Sawyer to send broadcasts
@@ -716,10 +2947,15 @@ class PoolBot(discord.Client):
             await self.prompt_user_pick(message)
             return
 
-        if command == '!addpack' and message.reference:
+        if command == '!addpack':
             await self.add_pack(message, argument)
             return
 
+        if (command == '!stats' and message.channel == self.bot_bunker_channel
+                and isinstance(message.author, discord.Member) and message.author.guild_permissions.administrator):
+            await self.post_stats(message)
+            return
+
         # if command == '!explore' and message.channel == self.packs_channel:
         #     await self.explore(message)
         #     return
@@ -743,6 +2979,9 @@ class PoolBot(discord.Client):
             await message.channel.send(
                 f"You can give me one of the following commands:\n"
                 f"> `!challenge`: Challenges the current player in the LFM (or duel) queue\n"
+                f"> `!addpack [ID] [message links] [recent N]`: Adds packs I've posted to the sealeddeck.tech pool "
+                f"with that ID, or to a new pool: the message you reply to, any linked messages, and your N most "
+                f"recently chosen packs\n"
                 f"> `!randint A B`: Generates a random integer n, where A <= n <= B. If only one input is given, "
                 f"uses that value as B and defaults A to 1. \n "
                 f"> `!help`: shows this message\n"
@@ -780,33 +3019,38 @@ class PoolBot(discord.Client):
             "XLN",
         ]
         set_to_generate = random.choice(possible_sets)
-        # Get and parse pool data from spreadsheet
-        raw_pools = await self.get_spreadsheet_values('Pools!B7:R200')
-        pools = [p for p in (parse_pool_row(r) for r in raw_pools) if p is not None]
-        curr_row = 6
-        for pool in pools:
-            curr_row += 1
-            pool_name = pool.get("name")
-            if not pool_name or pool_name.lower() not in message.author.display_name.lower():
-                continue
+        async with self.explore_lock:
+            found = await self.pools.find(message.author.display_name, message.author.id)
+            # The cached map counts can be minutes old, and the committee edits them by hand
+            pool = found and await self.pools.reload(*found)
+            if found and pool is None:
+                # The row moved, so the index was invalidated and this reads it again
+                found = await self.pools.find(message.author.display_name, message.author.id)
+                pool = found and found[1]
+            if not found or not pool:
+                await message.reply(f'Hmm, I can\'t find you in the league spreadsheet. '
+                                    f'Please post in {self.league_committee_channel.mention}')
+                return
+            curr_row = found[0]
             maps_remaining = pool.get("maps_remaining", 0)
             if maps_remaining <= 0:
                 await message.reply(f'By my records, you do not have any unused maps. If this is in error, '
                                     f'please post in {self.league_committee_channel.mention}')
                 return
 
-            # Mark the map as used
+            # Mark the map as used. The cached row is updated first so nothing reads the old counts meanwhile.
             maps_used = pool.get("maps_used", 0)
-            self.sheet.values().update(spreadsheetId=self.spreadsheet_id,
-                                       range=f'Pools!Q{curr_row}:Q{curr_row}', valueInputOption='USER_ENTERED',
-                                       body={'values': [[maps_used + 1]]}).execute()
+            pool["maps_used"] = maps_used + 1
+            pool["maps_remaining"] = maps_remaining - 1
+            try:
+                await self.writes.update(f'Pools!Q{curr_row}:Q{curr_row}', [[maps_used + 1]])
+            except SpreadsheetError:
+                self.pools.invalidate()
+                raise
 
-            # Roll a new pack
-            await self.packs_channel.send(
-                f'!{set_to_generate} {message.author.mention} follows a map to uncharted territory')
-            return
-        await message.reply(f'Hmm, I can\'t find you in the league spreadsheet. '
-                            f'Please post in {self.league_committee_channel.mention}')
+        # Roll a new pack
+        await self.packs_channel.send(
+            f'!{set_to_generate} {message.author.mention} follows a map to uncharted territory')
 
     async def track_starting_pool(self, message: discord.Message):
         # Handle cases where Booster Tutor fails to generate a sealeddeck.tech link
@@ -820,69 +3064,68 @@ class PoolBot(discord.Client):
             return
         sealed_deck_link = f'https://sealeddeck.tech/{sealed_deck_id}'
 
-        # Get and parse pool data from spreadsheet
+        # Find the player's row in the Pools tab
+        player = message.mentions[0]
         try:
-            raw_pools = await self.get_spreadsheet_values('Pools!B7:F200')
+            found = await self.pools.find(player.display_name, player.id)
         except SpreadsheetError as e:
             print(f"spreadsheet error — fetching pools: {e}")
             return
-        pools = [p for p in (parse_pool_row(r) for r in raw_pools) if p is not None]
-        curr_row = 6
-        for pool in pools:
-            curr_row += 1
-            pool_name = pool.get("name")
-            if not pool_name or pool_name.lower() not in message.mentions[0].display_name.lower():
-                continue
-            # Update the proper cell in the spreadsheet
-            body = {
-                'values': [
-                    [sealed_deck_link, sealed_deck_link],
-                ],
-            }
-            try:
-                self.sheet.values().update(spreadsheetId=self.spreadsheet_id,
-                                           range=f'Pools!E{curr_row}:F{curr_row}', valueInputOption='USER_ENTERED',
-                                           body=body).execute()
-                self.sheet.values().update(spreadsheetId=self.spreadsheet_id,
-                                           range=f'Pools!S{curr_row}:S{curr_row}', valueInputOption='USER_ENTERED',
-                                           body={'values': [[sealed_deck_link]]}).execute()
-            except HttpError as e:
-                print(f"spreadsheet error — updating pool: {e}")
-                return
+        if found is None:
+            # TODO do something if the value could not be found
+            return
+        curr_row, pool = found
 
+        # Update the proper cells in the spreadsheet. Both are queued together, so they go out in one batchUpdate.
+        try:
+            await gather(
+                self.writes.update(f'Pools!E{curr_row}:F{curr_row}', [[sealed_deck_link, sealed_deck_link]]),
+                self.writes.update(f'Pools!S{curr_row}:S{curr_row}', [[sealed_deck_link]]),
+            )
+        except SpreadsheetError as e:
+            print(f"spreadsheet error — updating pool: {e}")
+            self.pools.invalidate()
             return
-        # TODO do something if the value could not be found
-        return
+        pool["pool_id"] = sealed_deck_link
 
 
     async def pool_from_changes(self, changes: Sequence[Tuple[str, str, str]]) -> Sequence[SealedDeckEntry]:
-        """Reconstruct pool from change history. Raises SealedDeckError if any pack fetch fails."""
-        packs = []
-        removed_packs = []
-        cards: defaultdict[str, int] = defaultdict(int)
+        """Reconstruct pool from change history. Raises SealedDeckError naming every pack that could not be fetched."""
+        pack_counts: Counter[str] = Counter()
+        cards = CompactPool()
 
         for (_name, operation, value) in changes:
             if operation == "add pack":
-                packs.append(value)
+                pack_counts[value] += 1
             elif operation == "remove pack":
-                removed_packs.append(value)
+                pack_counts[value] -= 1
             elif operation == "add card":
-                cards[value] += 1
+                cards.add_card(value)
             elif operation == "remove card":
-                cards[value] -= 1
-
-        # Fetch and aggregate pack contents - sealeddeck_pool raises on failure
-        for pack_id in packs:
-            pack = await sealeddeck_pool(pack_id)
-            for card in pack:
-                cards[card["name"]] += card["count"]
-
-        for pack_id in removed_packs:
-            pack = await sealeddeck_pool(pack_id)
-            for card in pack:
-                cards[card["name"]] -= card["count"]
+                cards.add_card(value, -1)
+
+        # Packs that were added and removed again cancel out, so they are never fetched
+        pack_ids = [pack_id for pack_id, count in pack_counts.items() if count != 0]
+        semaphore = Semaphore(self.config.sealeddeck_fetch_concurrency or SEALEDDECK_FETCH_CONCURRENCY)
+
+        async def fetch(pack_id: str) -> Sequence[SealedDeckEntry]:
+            async with semaphore:
+                return await sealeddeck_pool(self.sealeddeck_session, pack_id, self.pool_cache)
+
+        results = await gather(*(fetch(pack_id) for pack_id in pack_ids), return_exceptions=True)
+        failed = [(pack_id, result) for pack_id, result in zip(pack_ids, results) if isinstance(result, BaseException)]
+        if failed:
+            for pack_id, err in failed:
+                print(f"sealeddeck error — fetching pack {pack_id}: {err}")
+            raise SealedDeckError(f"Failed to fetch packs: {', '.join(pack_id for pack_id, _ in failed)}")
+
+        # Fetch and aggregate pack contents, weighted by how many times each pack is still in the pool
+        for pack_id, pack in zip(pack_ids, results):
+            if isinstance(pack, BaseException):
+                continue
+            cards.add(CompactPool.from_entries(pack), pack_counts[pack_id])
 
-        return [{"name": name, "count": count} for name, count in cards.items() if count > 0]
+        return cards.to_entries()
 
     async def prompt_user_pick(self, message: discord.Message):
         # # Ensure the user doesn't already have a pending pick to make
@@ -899,38 +3142,45 @@ class PoolBot(discord.Client):
         # 	)
         # 	return
 
-        # Messages from Booster Tutor aren't tied to a user, so only one pair can be resolved at a time.
-        while self.awaiting_boosters_for_user is not None:
-            time.sleep(3)
-
         booster_one_type = message.content.split(None)[1]
         booster_two_type = message.content.split(None)[2]
-        self.num_boosters_awaiting = 2
-        self.awaiting_boosters_for_user = message.mentions[0]
+        user = message.mentions[0]
 
-        # Generate two packs of the specified types
-        await self.bot_bunker_channel.send(booster_one_type)
-        await self.bot_bunker_channel.send(booster_two_type)
+        # Generate two packs of the specified types. Booster Tutor's replies are matched back to this request in
+        # handle_booster_tutor_response, so any number of these can be in flight at once.
+        request = await self.booster_requests.request(user, [booster_one_type, booster_two_type])
+        try:
+            await wait_for(request.done, self.config.booster_response_timeout or BOOSTER_RESPONSE_TIMEOUT)
+        except TimeoutError:
+            self.booster_requests.cancel(request)
+            await self.packs_channel.send(
+                f'{user.mention} Sorry, Booster Tutor didn\'t generate your pack options in time. Please post in '
+                f'{self.league_committee_channel.mention} so someone can generate them manually.')
 
     async def handle_booster_tutor_response(self, message: discord.Message):
-        """Handle booster tutor pack generation response. Assumes called only when awaiting boosters."""
-        assert self.num_boosters_awaiting > 0, "Called without pending boosters"
-        assert self.awaiting_boosters_for_user is not None, "No user awaiting boosters"
-        user = self.awaiting_boosters_for_user
-        if self.num_boosters_awaiting == 2:
-            self.num_boosters_awaiting -= 1
-            await self.packs_channel.send(
-                f'Pack Option A for {user.mention}. To select this pack, DM me '
-                f'`!choosePackA`\n '
-                f'```{message.content.split("```")[1].strip()}```')
-        else:
-            self.num_boosters_awaiting -= 1
-            await self.packs_channel.send(
-                f'Pack Option B for {user.mention}. To select this pack, DM me '
-                f'`!choosePackB`\n '
-                f'```{message.content.split("```")[1].strip()}```')
-        if self.num_boosters_awaiting == 0:
-            self.awaiting_boosters_for_user = None
+        """Post a pack Booster Tutor generated as an option for the !playerchoice request it belongs to."""
+        slot = self.booster_requests.match(message)
+        if slot is None:
+            print(f"Booster Tutor response {message.id} doesn't match any pending request")
+            return
+        user = slot.request.user
+        option_message = await self.packs_channel.send(
+            f'Pack Option {slot.option} for {user.mention}. To select this pack, DM me '
+            f'`!choosePack{slot.option}`\n '
+            f'```{message.content.split("```")[1].strip()}```')
+        self.pack_options.record(user.id, slot.option, option_message.id)
+        self.booster_requests.complete(slot)
+
+    async def find_pack_option(self, user: Union[discord.Member, discord.User], option: str) -> Optional[discord.Message]:
+        """Find the user's pending pack option message, or None if there isn't one."""
+        message_id = self.pack_options.get(user.id, option)
+        if message_id is not None:
+            try:
+                return await self.packs_channel.fetch_message(message_id)
+            except discord.NotFound:
+                self.pack_options.remove(user.id, option)
+                return None
+        return None
 
     async def choose_pack(self, user: Union[discord.Member, discord.User], chosen_option: str):
         if chosen_option == 'A':
@@ -941,19 +3191,10 @@ class PoolBot(discord.Client):
             not_chosen_option = 'A'
             split = '!choosePackB`'
             not_chosen_split = '!choosePackA`'
-        chosen_message: Optional[discord.Message] = None
-        async for message in self.packs_channel.history(limit=500):
-            if (message.author.name == self.config.bot_name and message.mentions and message.mentions[0] == user
-                    and f'Pack Option {chosen_option}' in message.content):
-                chosen_message = message
-                break
-
-        not_chosen_message: Optional[discord.Message] = None
-        async for message in self.packs_channel.history(limit=500):
-            if (message.author.name == self.config.bot_name and message.mentions and message.mentions[0] == user
-                    and f'Pack Option {not_chosen_option}' in message.content):
-                not_chosen_message = message
-                break
+        chosen_message, not_chosen_message = await gather(
+            self.find_pack_option(user, chosen_option),
+            self.find_pack_option(user, not_chosen_option),
+        )
 
         if chosen_message is None or not_chosen_message is None:
             await user.send(
@@ -970,12 +3211,25 @@ class PoolBot(discord.Client):
 
         not_chosen_text = f'Pack not chosen by {user.mention}.' f'~~{not_chosen_message.content.split(not_chosen_split)[1]}~~'
         await update_message(not_chosen_message, not_chosen_text)  # Best effort, don't fail if this doesn't work
+        self.pack_options.remove(user.id, 'A', 'B')
 
         await user.send("Understood. Your selection has been noted.")
 
         # TODO this likely breaks because booster tutor messages and ours don't follow the same format anymore (embed vs content)
         await self.pool_tracker.track_pack(updated_chosen)
 
+    async def post_stats(self, message: discord.Message):
+        """Summarize the bot's metrics, attached as a file if they don't fit in a message."""
+        trackers = [tracker for tracker in (self.pool_tracker, self.second_pool_tracker) if tracker is not None]
+        queued = "\n".join(f"{tracker.pipeline.name} queued: {tracker.pipeline.depths()}" for tracker in trackers)
+        summary = f"{metrics.summary()}\n{queued}"
+        if len(summary) < 1900:
+            await message.channel.send(f"```\n{summary}\n```")
+        else:
+            await message.channel.send(
+                "Current stats:", file=discord.File(io.BytesIO(summary.encode()), filename="stats.txt")
+            )
+
     async def on_dm(self, message: discord.Message, command: str, argument: str):
         if command == '!choosepacka' or command == '!chooseurza':
             await self.choose_pack(message.author, 'A')
@@ -990,6 +3244,10 @@ class PoolBot(discord.Client):
                 await matchmaker.handle_command(message, argument)
                 return
 
+        if command == '!pool':
+            await self.send_pool(message.author, link=argument.strip().lower() == "link")
+            return
+
         if command == '!retractlfm' or command == '!nvm':
             handled = False
             for matchmaker in self.matchmakers:
@@ -1008,36 +3266,180 @@ class PoolBot(discord.Client):
             f"I'm sorry, but I didn't understand that. Please send one of the following commands:\n"
             f"{matchmaker_help}\n"
             f"> `!nvm`: removes an anonymous LFM that you've sent out.\n"
+            f"> `!pool`: sends you your current pool.\n"
+            f"> `!pool link`: uploads your current pool to sealeddeck.tech and sends you the link.\n"
             f"> `!choosePackA`: responds to a pending pack selection option.\n"
             f"> `!choosePackB`: responds to a pending pack selection option."
         )
 
+    async def send_pool(self, user: Union[discord.User, discord.Member], link: bool = False):
+        """
+        DM a player their current pool from the local pool store, in Arena format or with `link` as a new
+        sealeddeck.tech pool.
+        """
+        store = self.pool_tracker.pool_store
+        if store is None:
+            return
+        try:
+            _, player = await self.players.lookup(user.id)
+        except SpreadsheetError as e:
+            print(f"spreadsheet error — looking up player for !pool: {e}")
+            await user.send("I couldn't look up your pool right now, please try again later.")
+            return
+        if player is None:
+            await user.send("You're not in the Player Database, so I don't have a pool for you.")
+            return
+        # Picks up changes made since the last pack was tracked. Only new rows are read, and if the read fails the
+        # pool is served as of the last one.
+        try:
+            await self.pool_tracker.pool_ids.refresh()
+        except SpreadsheetError as e:
+            print(f"spreadsheet error — fetching changes for !pool: {e}")
+        try:
+            pool = await store.pool(player["name"])
+        except SealedDeckError as e:
+            print(f"sealeddeck error — fetching packs for !pool: {e}")
+            await user.send("Some of your packs couldn't be fetched from sealeddeck.tech, please try again later.")
+            return
+        if not pool:
+            await user.send("I couldn't find any cards in your pool.")
+            return
+        if link:
+            await self.send_pool_link(user, player["name"], pool)
+            return
+        arena_list = "\n".join(f"{card['count']} {card['name']}" for card in pool)
+        total = sum(card["count"] for card in pool)
+        if len(arena_list) > 1900:
+            await user.send(
+                f"Your pool ({total} cards):",
+                file=discord.File(io.BytesIO(arena_list.encode()), filename="pool.txt"),
+            )
+        else:
+            await user.send(f"Your pool ({total} cards):\n```\n{arena_list}\n```")
+
+    async def send_pool_link(self, user: Union[discord.User, discord.Member], name: str, pool: Sequence[SealedDeckEntry]):
+        """Upload a pool from the pool store, noting any cards it doesn't share with the player's latest pool."""
+        try:
+            pool_id = await pool_to_sealeddeck(self.sealeddeck_session, pool)
+        except SealedDeckError as e:
+            print(f"sealeddeck error — uploading pool for !pool link: {e}")
+            await user.send("sealeddeck.tech might be having some issues right now, please try again later.")
+            return
+        content = f"Your pool, rebuilt from the Pool Changes log: https://sealeddeck.tech/{pool_id}"
+        store = self.pool_tracker.pool_store
+        latest_id = self.pool_tracker.pool_ids.get(name)
+        if store is not None and latest_id:
+            try:
+                latest = await sealeddeck_pool(self.sealeddeck_session, latest_id, self.pool_cache)
+            except SealedDeckError as e:
+                # The link is still good, it just can't be compared
+                print(f"sealeddeck error — fetching latest pool for !pool link: {e}")
+            else:
+                only_log, only_latest = store.diff(name, latest)
+                differences = [f"+{card['count']} {card['name']}" for card in only_log]
+                differences += [f"-{card['count']} {card['name']}" for card in only_latest]
+                if differences:
+                    shown = "\n".join(differences[:POOL_DIFF_LINES])
+                    hidden = len(differences) - POOL_DIFF_LINES
+                    more = f"\n...and {hidden} more" if hidden > 0 else ""
+                    content += (
+                        f"\nIt differs from your latest pool, https://sealeddeck.tech/{latest_id}, by:\n"
+                        f"```\n{shown}{more}\n```"
+                    )
+        await user.send(content)
+
     async def add_pack(self, message: discord.Message, argument: str):
+        """
+        Add packs posted by the bot to a sealeddeck.tech pool with a single upload. `argument` is the pool ID, then
+        optionally links to or IDs of messages in the packs channel and `recent N` for the author's N most recently
+        chosen packs. The message being replied to is added too. Without a pool ID, the packs start a new pool.
+        """
         if message.channel != self.packs_channel:
             return
 
-        ref = message.reference and message.reference.message_id and await message.channel.fetch_message(
-            message.reference.message_id
+        tokens = argument.split()
+        sealeddeck_id = ""
+        if tokens and not DISCORD_MESSAGE_LINK.fullmatch(tokens[0]) and tokens[0].lower() != "recent":
+            sealeddeck_id = parse_sealeddeck_url(tokens[0]) or tokens[0]
+            tokens = tokens[1:]
+        message_ids: list[int] = []
+        if message.reference and message.reference.message_id:
+            message_ids.append(message.reference.message_id)
+        recent = 0
+        problems: list[str] = []
+        rest = iter(tokens)
+        for token in rest:
+            link = DISCORD_MESSAGE_LINK.fullmatch(token)
+            if link is not None:
+                if int(link.group(1)) == self.packs_channel.id:
+                    message_ids.append(int(link.group(2)))
+                else:
+                    problems.append(f"{token} isn't in {self.packs_channel.mention}")
+            elif token.isdigit():
+                message_ids.append(int(token))
+            elif token.lower() == "recent":
+                count = next(rest, "")
+                if count.isdigit():
+                    recent = int(count)
+                else:
+                    problems.append("`recent` needs to be followed by a number of packs")
+            else:
+                problems.append(f"`{token}` isn't a message link, message ID or `recent N`")
+        # Each message is fetched once, in the order given
+        message_ids = list(dict.fromkeys(message_ids))[:ADD_PACK_MAX_MESSAGES]
+
+        async def fetch(message_id: int) -> Optional[discord.Message]:
+            try:
+                return await self.packs_channel.fetch_message(message_id)
+            except discord.HTTPException:
+                problems.append(f"message {message_id} wasn't found in {self.packs_channel.mention}")
+                return None
+
+        fetched, recent_options = await gather(
+            gather(*(fetch(message_id) for message_id in message_ids)),
+            self.recent_pack_options(message.author, min(recent, ADD_PACK_MAX_MESSAGES)),
         )
-        if not ref:
-            return
-        if ref.author == self.booster_tutor:
+        replied_to = fetched[0] if message.reference and fetched else None
+        if replied_to is not None and replied_to.author == self.booster_tutor:
+            # Booster Tutor handles !addpack for its own packs
             return
-        if ref.author != self.user:
+
+        packs: list[Sequence[SealedDeckEntry]] = []
+        seen: set[int] = set()
+        for pack_message in [*fetched, *recent_options]:
+            if pack_message is None or pack_message.id in seen:
+                continue
+            seen.add(pack_message.id)
+            if pack_message.author != self.user or "```" not in pack_message.content:
+                problems.append(f"{pack_message.jump_url} does not contain packs I have generated")
+                continue
+            parsed = parse_arena_list(pack_message.content.split("```")[1])
+            problems.extend(f"{pack_message.jump_url} line {error.line_number}: `{error.line}`" for error in parsed.errors)
+            if parsed.cards:
+                packs.append(parsed.cards)
+            else:
+                problems.append(f"{pack_message.jump_url} has no cards in it")
+        problem_list = "".join(f"\n> {problem}" for problem in problems)
+
+        if not packs:
             await message.channel.send(
                 f"{message.author.mention}\n"
-                "The message you are replying to does not contain packs I have generated"
+                f"Reply to a pack I have generated with `!addpack <sealeddeck.tech ID>`, or add links to more packs "
+                f"or `recent N` for your N most recently chosen packs after the ID. Leave out the ID to start a new "
+                f"pool."
+                f"{problem_list}"
             )
+            return
 
-        pack_content = ref.content.split("```")[1].strip()
-        sealeddeck_id = argument.strip()
-        pack_json = arena_to_json(pack_content)
+        # Every pack goes into one sideboard, so the pool is updated with a single request
+        merged = CompactPool.aggregate(CompactPool.from_entries(pack) for pack in packs).to_entries()
+        what = "pack" if len(packs) == 1 else f"{len(packs)} packs"
         m = await message.channel.send(
             f"{message.author.mention}\n"
-            f":hourglass: Adding pack to pool..."
+            f":hourglass: Adding {what} to pool..."
         )
         try:
-            new_id = await pool_to_sealeddeck(pack_json, sealeddeck_id)
+            new_id = await pool_to_sealeddeck(self.sealeddeck_session, merged, sealeddeck_id)
         except SealedDeckError as e:
             print(f"Sealeddeck error: {e}")
             content = (
@@ -1053,51 +3455,88 @@ class PoolBot(discord.Client):
 
         content = (
             f"{message.author.mention}\n"
-            f"The packs have been added to the pool.\n\n"
-            f"**Updated sealeddeck.tech pool**\n"
+            f"Added {what} to {'the' if sealeddeck_id else 'a new'} pool.\n\n"
+            f"**{'Updated' if sealeddeck_id else 'New'} sealeddeck.tech pool**\n"
             f"link: https://sealeddeck.tech/{new_id}\n"
             f"ID: `{new_id}`"
         )
+        if problems:
+            content += f"\n\nSome of what you gave me was skipped:{problem_list}"
         await m.edit(content=content)
 
+    async def recent_pack_options(self, user: Union[discord.Member, discord.User], count: int) -> list[discord.Message]:
+        """
+        The user's `count` most recently chosen pack options in the packs channel, newest first. Options still waiting on
+        a choice are left out, since only one of each pair will end up in the pool.
+        """
+        found: list[discord.Message] = []
+        if count <= 0:
+            return found
+        async for message in self.packs_channel.history(limit=ADD_PACK_HISTORY_LIMIT):
+            if (message.author == self.user and message.mentions and message.mentions[0] == user
+                    and message.content.startswith("Pack chosen by")):
+                found.append(message)
+                if len(found) == count:
+                    break
+        return found
+
     async def print_members_not_in_league(self, league_name: str):
-        for member in self.guilds[0].members:
-            found = False
-            if member.bot:
-                continue
-            for role in member.roles:
-                if league_name in role.name:
-                    found = True
-            if not found:
-                print(member.display_name)
+        for member in self.members_not_in_league(league_name):
+            print(member.display_name)
 
     async def message_members(self, message: str = ""):
-        for member in self.guilds[0].members:
-            if member.display_name in 'put names here':
-                print('trying to DM: ' + member.display_name)
-                # if 'Sawyer T' in member.display_name:
-                await message_member(member, message)
-                print('DMed ' + member.display_name)
+        recipients = [member for member in self.guilds[0].members if member.display_name in 'put names here']
+        for member, status in await broadcast(recipients, message, self.dm_bucket, self.broadcast_concurrency):
+            print(f'DM to {member.display_name}: {status}')
 
     async def message_members_not_in_league(self, league_name: str, content: str, sender: Union[discord.Member, discord.User], test_mode=False):
-        count = 0
         if test_mode:
-            await message_member(sender, content)
-            count += 1
+            results = await broadcast([sender], content, self.dm_bucket)
         else:
-            for member in self.guilds[0].members:
-                found = False
-                if member.bot:
-                    continue
-                for role in member.roles:
-                    if league_name in role.name:
-                        found = True
-                if not found:
-                    print('trying to DM: ' + member.display_name)
-                    await message_member(member, content)
-                    print('DMed ' + member.display_name)
-                    count += 1
-        await sender.send(f'Successfully DMed {count} user(s).')
+            recipients = self.members_not_in_league(league_name)
+            # The journal is keyed by audience and content, so sending the same broadcast again picks up where an
+            # interrupted one left off instead of DMing anyone twice
+            journal = BroadcastJournal(BroadcastJournal.path_for(
+                self.config.broadcast_journal_dir or BROADCAST_JOURNAL_DIR, league_name, content
+            ))
+            try:
+                results = await broadcast(recipients, content, self.dm_bucket, self.broadcast_concurrency, journal)
+            finally:
+                journal.close()
+        summary, report = broadcast_report(results)
+        await sender.send(summary, file=report)
 
     async def get_spreadsheet_values(self, range: str, valueRenderOption="FORMATTED_VALUE") -> list[list[str]]:
         return await get_spreadsheet_values(self.sheet, self.spreadsheet_id, range, valueRenderOption)
+
+    async def close(self):
+        await super().close()
+        for matchmaker in getattr(self, "matchmakers", []):
+            matchmaker.stop()
+        for tracker in (getattr(self, "pool_tracker", None), getattr(self, "second_pool_tracker", None)):
+            if tracker is not None:
+                await tracker.stop()
+                # Anything still buffered is written before the Sheets client goes away
+                await tracker.writes.close()
+                if tracker.pool_store is not None:
+                    tracker.pool_store.close()
+        writes: Optional[SheetWriteBuffer] = getattr(self, "writes", None)
+        if writes is not None:
+            await writes.close()
+        session: Optional[aiohttp.ClientSession] = getattr(self, "sealeddeck_session", None)
+        if session is not None:
+            await session.close()
+        pool_cache: Optional[PoolCache] = getattr(self, "pool_cache", None)
+        if pool_cache is not None:
+            pool_cache.close()
+        retry_queue: Optional[RetryQueue] = getattr(self, "retry_queue", None)
+        if retry_queue is not None:
+            retry_queue.close()
+        sheet: Optional[SheetsClient] = getattr(self, "sheet", None)
+        if sheet is not None:
+            sheet.shutdown()
+        if self.recorder is not None:
+            self.recorder.close()
+        metrics_server: Optional[web.AppRunner] = getattr(self, "metrics_server", None)
+        if metrics_server is not None:
+            await metrics_server.cleanup()
@@ -0,0 +1,855 @@
+"""
+Offline benchmarks for PoolBot's hot paths.
+
+PoolBot, PoolTracker and Matchmaker run against local stand-ins for their services: an in-memory Google Sheets
+`spreadsheets()` resource, a local aiohttp server playing sealeddeck.tech, and synthetic Discord users, channels and
+messages. Every stand-in has configurable latency and error injection. Each benchmark reports throughput and
+p50/p95/p99 latency. The results are also written as JSON, so runs from different commits can be compared with
+--baseline.
+
+    python bench.py --players 100 --output bench_results.json
+    python bench.py --players 100 --baseline bench_results.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Sequence, cast
+
+import discord
+import httplib2
+from aiohttp import web
+from google.auth.exceptions import RefreshError
+from googleapiclient.errors import HttpError
+
+import PoolBot
+import utils
+
+BENCHMARKS = (
+    "startup", "track_pack", "choose_pack", "issue_challenge", "pool_from_changes", "pool_store", "parse_arena",
+    "sheet_write_failures",
+)
+CARD_NAMES = [f"Card {i:03}" for i in range(300)]
+PLAYER_ID_BASE = 10_000
+
+
+def column_index(letters: str) -> int:
+    """0-based index of a column given in A1 notation."""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index - 1
+
+
+RANGE_RE = re.compile(r"^(?:'(?P<quoted>(?:[^']|'')+)'|(?P<tab>[^!]+))!(?P<c1>[A-Z]+)(?P<r1>\d*)(?::(?P<c2>[A-Z]+)(?P<r2>\d*))?$")
+
+
+def parse_range(a1: str) -> tuple[str, int, int, Optional[int], int]:
+    """Split an A1 range into (tab, first row, first col, last row, last col), 0-based and inclusive."""
+    match = RANGE_RE.match(a1)
+    if match is None:
+        raise ValueError(f"Unsupported range {a1}")
+    tab = match.group("tab") or match.group("quoted").replace("''", "'")
+    first_row = int(match.group("r1")) - 1 if match.group("r1") else 0
+    first_col = column_index(match.group("c1"))
+    last_col = column_index(match.group("c2")) if match.group("c2") else first_col
+    last_row = int(match.group("r2")) - 1 if match.group("r2") else None
+    if match.group("c2") is None:
+        last_row = first_row
+    return tab, first_row, first_col, last_row, last_col
+
+
+class Faults:
+    """
+    Latency and error injection shared by a fake service. `error` makes the exception injected failures raise,
+    instead of the service's usual error response.
+    """
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, error: Optional[Callable[[], Exception]] = None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error = error
+        self.calls = 0
+        self.errors = 0
+
+    def should_fail(self) -> bool:
+        self.calls += 1
+        if random.random() < self.error_rate:
+            self.errors += 1
+            return True
+        return False
+
+
+class FakeRequest:
+    """A prepared Sheets request. Like the real thing, nothing happens until it's executed."""
+    def __init__(self, sheets: "FakeSpreadsheets", method: str, run: Callable[[], Any]):
+        self.sheets = sheets
+        self.methodId = f"sheets.spreadsheets.{method}"
+        self.run = run
+
+    def execute(self, http: Any = None, num_retries: int = 0) -> Any:
+        faults = self.sheets.faults
+        if faults.latency:
+            time.sleep(faults.latency)
+        if faults.should_fail():
+            if faults.error is not None:
+                raise faults.error()
+            raise HttpError(httplib2.Response({"status": 503}), b"injected failure")
+        with self.sheets.lock:
+            return self.run()
+
+
+class FakeValues:
+    def __init__(self, sheets: "FakeSpreadsheets"):
+        self.sheets = sheets
+
+    def get(self, spreadsheetId: str, range: str, valueRenderOption: str = "FORMATTED_VALUE") -> FakeRequest:
+        return FakeRequest(self.sheets, "values.get", lambda: self.sheets.read(range))
+
+    def append(self, spreadsheetId: str, range: str, valueInputOption: str, body: dict) -> FakeRequest:
+        return FakeRequest(self.sheets, "values.append", lambda: self.sheets.append(range, body["values"]))
+
+    def update(self, spreadsheetId: str, range: str, valueInputOption: str, body: dict) -> FakeRequest:
+        return FakeRequest(self.sheets, "values.update", lambda: self.sheets.write(range, body["values"]))
+
+    def batchUpdate(self, spreadsheetId: str, body: dict) -> FakeRequest:
+        def run():
+            for data in body["data"]:
+                self.sheets.write(data["range"], data["values"])
+            return {"totalUpdatedRanges": len(body["data"])}
+        return FakeRequest(self.sheets, "values.batchUpdate", run)
+
+
+class FakeSpreadsheets:
+    """
+    In-memory stand-in for the Sheets API `spreadsheets()` resource, covering the calls PoolBot makes. Requests sleep
+    for the configured latency on the executing thread, like a blocking HTTP round trip would.
+    """
+    def __init__(self, faults: Faults):
+        self.faults = faults
+        self.lock = threading.Lock()
+        self.tabs: dict[str, list[list[Any]]] = {}
+        self.tab_ids: dict[str, int] = {}
+        self.format_requests = 0
+
+    def add_tab(self, title: str, tab_id: int, rows: list[list[Any]]):
+        self.tabs[title] = rows
+        self.tab_ids[title] = tab_id
+
+    def values(self) -> FakeValues:
+        return FakeValues(self)
+
+    def get(self, spreadsheetId: str, fields: str = "") -> FakeRequest:
+        return FakeRequest(self, "get", lambda: {
+            "sheets": [{"properties": {"sheetId": tab_id, "title": title}} for title, tab_id in self.tab_ids.items()]
+        })
+
+    def batchUpdate(self, spreadsheetId: str, body: dict) -> FakeRequest:
+        def run():
+            self.format_requests += len(body["requests"])
+            return {}
+        return FakeRequest(self, "batchUpdate", run)
+
+    def read(self, a1: str) -> dict:
+        tab, first_row, first_col, last_row, last_col = parse_range(a1)
+        rows = self.tabs[tab][first_row:None if last_row is None else last_row + 1]
+        values = [[str(cell) for cell in row[first_col:last_col + 1]] for row in rows]
+        # Like Sheets, drop trailing empty cells and rows
+        values = [row[:max((i + 1 for i, cell in enumerate(row) if cell != ""), default=0)] for row in values]
+        while values and not values[-1]:
+            values.pop()
+        return {"values": values} if values else {}
+
+    def write(self, a1: str, values: list[list[Any]]):
+        tab, first_row, first_col, _, _ = parse_range(a1)
+        grid = self.tabs[tab]
+        for row_offset, row_values in enumerate(values):
+            while len(grid) <= first_row + row_offset:
+                grid.append([])
+            row = grid[first_row + row_offset]
+            while len(row) < first_col + len(row_values):
+                row.append("")
+            row[first_col:first_col + len(row_values)] = row_values
+        return {"updatedRange": a1}
+
+    def append(self, a1: str, values: list[list[Any]]):
+        tab, _, first_col, _, _ = parse_range(a1)
+        grid = self.tabs[tab]
+        last_used = max((i for i, row in enumerate(grid) if any(cell != "" for cell in row)), default=-1)
+        grid[last_used + 1:last_used + 1] = [[""] * first_col + list(row) for row in values]
+        return {"updates": {"updatedRows": len(values)}}
+
+
+class FakeSealedDeck:
+    """Local aiohttp server standing in for sealeddeck.tech's /api/pools."""
+    def __init__(self, faults: Faults):
+        self.faults = faults
+        self.pools: dict[str, list[PoolBot.SealedDeckEntry]] = {}
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    async def _delay_or_fail(self) -> Optional[web.Response]:
+        if self.faults.latency:
+            await asyncio.sleep(self.faults.latency)
+        if self.faults.should_fail():
+            return web.Response(status=503, text="injected failure")
+        return None
+
+    async def get_pool(self, request: web.Request) -> web.Response:
+        failure = await self._delay_or_fail()
+        if failure is not None:
+            return failure
+        pool = self.pools.get(request.match_info["pool_id"])
+        if pool is None:
+            return web.Response(status=404)
+        return web.json_response({"sideboard": pool, "deck": [], "hidden": []})
+
+    async def create_pool(self, request: web.Request) -> web.Response:
+        failure = await self._delay_or_fail()
+        if failure is not None:
+            return failure
+        body = await request.json()
+        base = self.pools.get(body.get("poolId", ""), [])
+        pool_id = uuid.uuid4().hex[:10]
+        self.pools[pool_id] = [*base, *body["sideboard"]]
+        return web.json_response({"poolId": pool_id})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/api/pools/{pool_id}", self.get_pool)
+        app.router.add_post("/api/pools", self.create_pool)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}/api/pools"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+class FakeDiscord:
+    """
+    Shared state for the synthetic Discord objects: message IDs, and the faults injected into every REST call (sending,
+    fetching and editing messages). Injected failures raise discord.HTTPException with a 503, like a Discord outage.
+    """
+    def __init__(self, faults: Faults):
+        self.faults = faults
+        self.ids = itertools.count(1_000_000)
+
+    async def rest_call(self):
+        if self.faults.latency:
+            await asyncio.sleep(self.faults.latency)
+        if self.faults.should_fail():
+            if self.faults.error is not None:
+                raise self.faults.error()
+            raise discord.HTTPException(cast(Any, _FakeResponse(503)), "injected failure")
+
+
+class FakeUser:
+    def __init__(self, fake: FakeDiscord, user_id: int, name: str, bot: bool = False):
+        self.fake = fake
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{user_id}>"
+        self.bot = bot
+        self.roles: list[Any] = []
+        self.dms: list[str] = []
+
+    async def send(self, content: Optional[str] = None, **kwargs: Any):
+        await self.fake.rest_call()
+        self.dms.append(content or "")
+
+
+class FakeEmbed:
+    def __init__(self, description: Optional[str] = None, fields: Sequence[Any] = ()):
+        self.description = description
+        self.fields = list(fields)
+
+
+class FakeReference:
+    def __init__(self, message_id: int, channel: "FakeChannel"):
+        self.message_id = message_id
+        self.channel = channel
+        # Only set for replies that arrive over the gateway
+        self.resolved = None
+
+    @property
+    def cached_message(self) -> Optional["FakeMessage"]:
+        return self.channel.messages.get(self.message_id)
+
+
+class FakeMessage:
+    def __init__(
+        self,
+        channel: "FakeChannel",
+        author: FakeUser,
+        content: str = "",
+        embeds: Sequence[FakeEmbed] = (),
+        reference: Optional[int] = None,
+        mentions: Sequence[FakeUser] = (),
+        message_id: Optional[int] = None,
+    ):
+        self.id = message_id if message_id is not None else next(channel.fake.ids)
+        self.channel = channel
+        self.author = author
+        self.content = content
+        self.embeds = list(embeds)
+        self.reference = FakeReference(reference, channel) if reference else None
+        self.mentions = list(mentions)
+        self.guild = channel.guild
+        self.jump_url = f"https://discord.test/{channel.id}/{self.id}"
+
+    async def edit(self, content: Optional[str] = None, **kwargs: Any) -> "FakeMessage":
+        await self.channel.fake.rest_call()
+        if content is not None:
+            self.content = content
+        return self
+
+    async def delete(self):
+        await self.channel.fake.rest_call()
+        self.channel.messages.pop(self.id, None)
+
+    async def reply(self, content: str, **kwargs: Any) -> "FakeMessage":
+        return await self.channel.send(content)
+
+
+class FakeChannel:
+    def __init__(self, fake: FakeDiscord, channel_id: int, name: str, bot_user: FakeUser, guild: Any = True):
+        self.fake = fake
+        self.id = channel_id
+        self.name = name
+        self.bot_user = bot_user
+        self.guild = guild
+        self.mention = f"<#{channel_id}>"
+        self.jump_url = f"https://discord.test/{channel_id}"
+        self.messages: dict[int, FakeMessage] = {}
+
+    def post(self, message: FakeMessage) -> FakeMessage:
+        """Add a message without a REST round trip, e.g. one another user or bot sent."""
+        self.messages[message.id] = message
+        return message
+
+    async def send(self, content: Optional[str] = None, **kwargs: Any) -> FakeMessage:
+        await self.fake.rest_call()
+        return self.post(FakeMessage(self, self.bot_user, content or ""))
+
+    async def fetch_message(self, message_id: int) -> FakeMessage:
+        await self.fake.rest_call()
+        message = self.messages.get(message_id)
+        if message is None:
+            raise discord.NotFound(cast(Any, _FakeResponse(404)), "Unknown Message")
+        return message
+
+    async def history(self, limit: int = 100) -> AsyncIterator[FakeMessage]:
+        await self.fake.rest_call()
+        for message in list(reversed(self.messages.values()))[:limit]:
+            yield message
+
+    @asynccontextmanager
+    async def typing(self) -> AsyncIterator[None]:
+        yield
+
+
+class _FakeResponse:
+    """Just enough of an aiohttp response for discord.HTTPException."""
+    def __init__(self, status: int):
+        self.status = status
+        self.reason = "injected"
+        self.headers: dict[str, str] = {}
+
+
+def random_pack(size: int = 15) -> list[PoolBot.SealedDeckEntry]:
+    counts: dict[str, int] = {}
+    for name in random.choices(CARD_NAMES, k=size):
+        counts[name] = counts.get(name, 0) + 1
+    return [{"name": name, "count": count} for name, count in counts.items()]
+
+
+def arena_list(pack: Sequence[PoolBot.SealedDeckEntry]) -> str:
+    return "\n".join(f"{card['count']} {card['name']} (BNC) {i + 1}" for i, card in enumerate(pack))
+
+
+def cube_export(lines: int) -> str:
+    """An Arena export the size of a large cube dump, with section headers, blank lines and repeated cards."""
+    export = ["Deck"]
+    for i in range(lines):
+        if i % 500 == 499:
+            export += ["", "Sideboard"]
+        set_code = random.choice(("BNC", "M10", "MH2", "ZNR"))
+        export.append(f"{random.randint(1, 4)} {random.choice(CARD_NAMES)} ({set_code}) {random.randint(1, 400)}")
+    return "\n".join(export)
+
+
+class Harness:
+    """A PoolBot wired to fake services, with a synthetic league of `players` players."""
+    def __init__(self, args: argparse.Namespace, workdir: Path, player_ids: Optional[Sequence[int]] = None):
+        self.args = args
+        self.workdir = workdir
+        self.sheets = FakeSpreadsheets(Faults(args.sheets_latency, args.sheets_error_rate))
+        self.sealeddeck = FakeSealedDeck(Faults(args.sealeddeck_latency, args.sealeddeck_error_rate))
+        self.discord = FakeDiscord(Faults(args.discord_latency, args.discord_error_rate))
+        self.bot_user = FakeUser(self.discord, 1, "PoolBot", bot=True)
+        self.booster_tutor = FakeUser(self.discord, 2, "Booster Tutor", bot=True)
+        if player_ids is None:
+            player_ids = [PLAYER_ID_BASE + i for i in range(args.players)]
+        self.players = [FakeUser(self.discord, player_id, f"Player {i:04}") for i, player_id in enumerate(player_ids)]
+        self.channels: dict[str, Any] = {}
+        self.bot: Any = None
+
+    def seed_spreadsheet(self):
+        player_rows: list[list[Any]] = [["Name", "", "", "Discord ID"]]
+        change_rows: list[list[Any]] = [["Timestamp", "Name", "Operation", "Value", "", "Pool"]]
+        pool_rows: list[list[Any]] = [[] for _ in range(6)]
+        for player in self.players:
+            pool_id = f"seed-{player.id}"
+            self.sealeddeck.pools[pool_id] = random_pack(90)
+            row: list[Any] = [player.name, "", "", player.id] + [""] * 26 + [random.randint(0, 20)]
+            player_rows.append(row)
+            change_rows.append([datetime.now().isoformat(), player.name, "add pack", pool_id, "", pool_id])
+            pool_rows.append(["", player.name, "", "", "", f"https://sealeddeck.tech/{pool_id}"] + [""] * 10 + [0, 3])
+        self.sheets.add_tab("Player Database", 2, player_rows)
+        self.sheets.add_tab("Pool Changes", 3, change_rows)
+        self.sheets.add_tab("Pools", 1, pool_rows)
+
+    async def start(self):
+        await self.sealeddeck.start()
+        PoolBot.SEALEDDECK_URL = self.sealeddeck.url
+        self.seed_spreadsheet()
+        for channel_id, name in enumerate(
+                ["pool", "packs", "second-packs", "lfm", "bot-bunker", "league-committee", "side-quest-pools"], start=100
+        ):
+            self.channels[name] = FakeChannel(self.discord, channel_id, name, self.bot_user)
+        self.bot = await self.new_bot()
+        await self.bot.start_services(self.new_sheet_client())
+
+    def new_sheet_client(self) -> PoolBot.SheetsClient:
+        return PoolBot.SheetsClient(self.sheets, None, PoolBot.SHEETS_MAX_WORKERS)
+
+    async def new_bot(self) -> Any:
+        """A PoolBot that has found its channels and users, as in on_ready, but hasn't started its services."""
+        config = utils.Config(
+            discord_token="",
+            debug_mode="",
+            spreadsheet_id="bench",
+            pools_tab_id="1",
+            player_database_tab_id="2",
+            pool_channel_id=100,
+            packs_channel_id=101,
+            second_packs_channel_id=102,
+            lfm_channel_id=103,
+            bot_bunker_channel_id=104,
+            league_committee_channel_id=105,
+            side_quest_pools_channel_id=106,
+            bot_name=self.bot_user.name,
+            pool_cache_path=str(self.workdir / "pool_cache.sqlite3"),
+            retry_queue_path=str(self.workdir / "pack_retries.sqlite3"),
+            pool_store_path=str(self.workdir / "pool_store.sqlite3"),
+            pack_options_path=str(self.workdir / "pack_options.json"),
+            sheet_flush_interval=self.args.sheet_flush_interval,
+        )
+        # Typed loosely so the fakes can stand in for discord.py and Google API objects
+        bot: Any = PoolBot.PoolBot(config, discord.Intents.none())
+        await bot.setup_hook()
+        bot._connection.user = self.bot_user
+        bot.dev_mode = False
+        bot.pools_tab_id = config.pools_tab_id
+        bot.spreadsheet_id = config.spreadsheet_id
+        bot.pool_channel = self.channels["pool"]
+        bot.packs_channel = self.channels["packs"]
+        bot.second_packs_channel = self.channels["second-packs"]
+        bot.lfm_channel = self.channels["lfm"]
+        bot.bot_bunker_channel = self.channels["bot-bunker"]
+        bot.league_committee_channel = self.channels["league-committee"]
+        bot.side_quest_pools_channel = self.channels["side-quest-pools"]
+        bot.booster_tutor = self.booster_tutor
+        bot.pack_options = PoolBot.PackOptionIndex(config.pack_options_path or PoolBot.PACK_OPTIONS_PATH)
+        bot.booster_requests = PoolBot.BoosterRequests(bot.bot_bunker_channel)
+        return bot
+
+    @staticmethod
+    async def stop_bot(bot: Any):
+        await bot.pool_tracker.stop()
+        await bot.writes.close()
+        await bot.sealeddeck_session.close()
+        bot.sheet.shutdown()
+        bot.pool_cache.close()
+        bot.retry_queue.close()
+        bot.pool_tracker.pool_store.close()
+        for matchmaker in bot.matchmakers:
+            matchmaker.stop()
+
+    async def stop(self):
+        await self.stop_bot(self.bot)
+        await self.sealeddeck.stop()
+
+    def pack_message(self, player: FakeUser, pack: Sequence[PoolBot.SealedDeckEntry]) -> FakeMessage:
+        """A Booster Tutor pack in the packs channel, replying to the command that mentioned `player`."""
+        packs = self.channels["packs"]
+        command = packs.post(FakeMessage(packs, self.bot_user, f"!BNC {player.mention}", mentions=[player]))
+        embed = FakeEmbed(f"```\n{arena_list(pack)}\n```")
+        return packs.post(FakeMessage(packs, self.booster_tutor, "", [embed], reference=command.id))
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: Sequence[float], errors: int, elapsed: float) -> dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "throughput_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+    }
+
+
+async def measure(operations: Sequence[Callable[[], Awaitable[bool]]], concurrency: int) -> dict[str, float]:
+    """Run every operation, `concurrency` at a time. An operation returns False or raises to count as an error."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+
+    async def run(operation: Callable[[], Awaitable[bool]]):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                ok = await operation()
+            except Exception as e:
+                print(f"benchmark operation failed: {e}")
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(operation) for operation in operations))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def bench_track_pack(harness: Harness) -> dict[str, float]:
+    """Submit-to-written latency for packs tracked through the pipeline, several packs per player at once."""
+    tracker = harness.bot.pool_tracker
+
+    def operation(player: FakeUser) -> Callable[[], Awaitable[bool]]:
+        async def run() -> bool:
+            done = await tracker.track_pack(harness.pack_message(player, random_pack()))
+            return await done
+        return run
+
+    players = harness.players * harness.args.packs_per_player
+    return await measure([operation(player) for player in players], harness.args.concurrency)
+
+
+async def bench_choose_pack(harness: Harness) -> dict[str, float]:
+    """Resolving a !choosePackA against pending options, including tracking the chosen pack."""
+    bot = harness.bot
+    packs = harness.channels["packs"]
+    for player in harness.players:
+        command = packs.post(FakeMessage(packs, harness.bot_user, f"!playerchoice {player.mention}", mentions=[player]))
+        for option in "AB":
+            content = (f'Pack Option {option} for {player.mention}. To select this pack, DM me '
+                       f'`!choosePack{option}`\n ```{arena_list(random_pack())}```')
+            message = packs.post(FakeMessage(packs, harness.bot_user, content, mentions=[player], reference=command.id))
+            # Shaped like the Booster Tutor embeds PoolTracker expects, so the chosen pack gets tracked
+            message.embeds = [FakeEmbed(content[content.index("```"):])]
+            bot.pack_options.record(player.id, option, message.id)
+
+    tracked: list[asyncio.Future] = []
+    original_track_pack = bot.pool_tracker.track_pack
+
+    async def track_pack(message: Any) -> asyncio.Future:
+        done = await original_track_pack(message)
+        tracked.append(done)
+        return done
+
+    bot.pool_tracker.track_pack = track_pack
+
+    def operation(player: FakeUser) -> Callable[[], Awaitable[bool]]:
+        async def run() -> bool:
+            await bot.choose_pack(player, "A")
+            return bool(player.dms) and player.dms[-1].startswith("Understood")
+        return run
+
+    try:
+        result = await measure([operation(player) for player in harness.players], harness.args.concurrency)
+        result["errors"] += sum(not ok for ok in await asyncio.gather(*tracked))
+    finally:
+        bot.pool_tracker.track_pack = original_track_pack
+    return result
+
+
+async def bench_issue_challenge(harness: Harness) -> dict[str, float]:
+    """
+    !challenge against waiting LFMs, including the Player Database lookups for the coin flip. Half the players post an
+    LFM, then the other half all challenge at once; every challenge should find its own match.
+    """
+    bot = harness.bot
+    lfm = harness.channels["lfm"]
+    seekers, challengers = harness.players[::2], harness.players[1::2]
+    for seeker in seekers:
+        dm = FakeMessage(FakeChannel(harness.discord, 0, "dm", harness.bot_user, guild=None), seeker, "!lfm")
+        await bot.matchmaker.handle_command(dm, "")
+
+    def operation(challenger: FakeUser) -> Callable[[], Awaitable[bool]]:
+        async def run() -> bool:
+            await bot.matchmaker.issue_challenge(lfm.post(FakeMessage(lfm, challenger, "!challenge")))
+            return True
+        return run
+
+    result = await measure([operation(challenger) for challenger in challengers], harness.args.concurrency)
+    # Each LFM left over means a challenge wasn't matched, and each one missing beyond that means a double match
+    result["errors"] += abs(len(seekers) - len(challengers) - len(bot.matchmaker))
+    return result
+
+
+async def bench_startup(harness: Harness) -> dict[str, float]:
+    """Starting the bot's services from scratch: building trackers and loading the spreadsheets they need."""
+    latencies: list[float] = []
+    started = time.perf_counter()
+    for _ in range(harness.args.startups):
+        bot = await harness.new_bot()
+        operation_started = time.perf_counter()
+        await bot.start_services(harness.new_sheet_client())
+        latencies.append(time.perf_counter() - operation_started)
+        await harness.stop_bot(bot)
+    return summarize(latencies, 0, time.perf_counter() - started)
+
+
+def change_histories(harness: Harness) -> list[list[tuple[str, str, str]]]:
+    """A Pool Changes history for every player, with the packs it adds served by the fake sealeddeck.tech."""
+    histories: list[list[tuple[str, str, str]]] = []
+    for player in harness.players:
+        history: list[tuple[str, str, str]] = []
+        for i in range(harness.args.history_length):
+            pack_id = f"pack-{player.id}-{i}"
+            harness.sealeddeck.pools.setdefault(pack_id, random_pack())
+            history.append((player.name, "add pack", pack_id))
+            if i % 10 == 9:
+                # Packs that are swapped out again
+                history.append((player.name, "remove pack", pack_id))
+            if i % 5 == 4:
+                history.append((player.name, "add card", random.choice(CARD_NAMES)))
+        histories.append(history)
+    return histories
+
+
+async def bench_pool_from_changes(harness: Harness, warm: bool) -> dict[str, float]:
+    """Rebuilding pools from their change history - cold fetches every pack, warm hits the pool cache."""
+    bot = harness.bot
+    histories = change_histories(harness)
+
+    if not warm:
+        # Drop anything cached by earlier benchmarks so every pack is fetched
+        bot.pool_cache.close()
+        bot.pool_cache = PoolBot.PoolCache(str(harness.workdir / f"pool_cache_{uuid.uuid4().hex}.sqlite3"))
+
+    def operation(history: list[tuple[str, str, str]]) -> Callable[[], Awaitable[bool]]:
+        async def run() -> bool:
+            return len(await bot.pool_from_changes(history)) > 0
+        return run
+
+    return await measure([operation(history) for history in histories], harness.args.concurrency)
+
+
+async def bench_pool_store(harness: Harness) -> tuple[dict[str, float], dict[str, float]]:
+    """
+    Reading pools from the local pool store once the same histories as pool_from_changes have been folded in, and
+    totalling every card across the league.
+    """
+    bot = harness.bot
+    histories = change_histories(harness)
+    store = PoolBot.PoolStore(
+        str(harness.workdir / f"pool_store_{uuid.uuid4().hex}.sqlite3"), "bench", bot.sealeddeck_session, bot.pool_cache
+    )
+    try:
+        store.ingest(PoolBot.PoolIdIndex.FIRST_ROW, [list(change) for history in histories for change in history])
+        await store.resolve()
+
+        def operation(player: FakeUser) -> Callable[[], Awaitable[bool]]:
+            async def run() -> bool:
+                return bool(await store.pool(player.name))
+            return run
+
+        reads = await measure([operation(player) for player in harness.players], harness.args.concurrency)
+
+        async def totals() -> bool:
+            return bool(store.totals())
+
+        return reads, await measure([totals] * 20, 1)
+    finally:
+        store.close()
+
+
+async def bench_parse_arena(harness: Harness) -> dict[str, float]:
+    """Parsing large Arena exports, reported per export with the lines parsed per second alongside."""
+    export = cube_export(harness.args.cube_lines)
+
+    async def parse() -> bool:
+        parsed = PoolBot.parse_arena_list(export)
+        return bool(parsed.cards) and not parsed.errors
+
+    result = await measure([parse] * harness.args.parses, 1)
+    result["lines_per_s"] = round(result["throughput_per_s"] * len(export.splitlines()))
+    return result
+
+
+# Failures that reach SheetsClient.execute's caller without being an HttpError
+TRANSPORT_ERRORS: tuple[Callable[[], Exception], ...] = (
+    lambda: TimeoutError("injected timeout"),
+    lambda: ConnectionResetError("injected reset"),
+    lambda: httplib2.HttpLib2Error("injected httplib2 failure"),
+    lambda: RefreshError("injected token refresh failure"),
+)
+
+
+async def bench_sheet_write_failures(harness: Harness) -> dict[str, float]:
+    """
+    Pack rows written while every Sheets request fails with a transport error rather than an HttpError. Each write has
+    to fail with SpreadsheetError within a few flush intervals; one that hangs or succeeds counts as an error.
+    """
+    faults = harness.sheets.faults
+    tracker = harness.bot.pool_tracker
+    errors = itertools.cycle(TRANSPORT_ERRORS)
+    saved = faults.error_rate, faults.error
+    faults.error_rate, faults.error = 1.0, lambda: next(errors)()
+
+    def operation(player: FakeUser) -> Callable[[], Awaitable[bool]]:
+        async def run() -> bool:
+            try:
+                await asyncio.wait_for(
+                    tracker.write_pack(player.name, "pack", "pool"), tracker.writes.flush_interval * 5 + 10
+                )
+            except PoolBot.SpreadsheetError:
+                return True
+            return False
+        return run
+
+    try:
+        return await measure([operation(player) for player in harness.players], harness.args.concurrency)
+    finally:
+        faults.error_rate, faults.error = saved
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmarks(args: argparse.Namespace) -> dict[str, dict[str, float]]:
+    random.seed(args.seed)
+    results: dict[str, dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        harness = Harness(args, Path(workdir))
+        await harness.start()
+        try:
+            for name in args.benchmarks:
+                if name == "startup":
+                    results[name] = await bench_startup(harness)
+                elif name == "track_pack":
+                    results[name] = await bench_track_pack(harness)
+                elif name == "choose_pack":
+                    results[name] = await bench_choose_pack(harness)
+                elif name == "issue_challenge":
+                    results[name] = await bench_issue_challenge(harness)
+                elif name == "pool_from_changes":
+                    results["pool_from_changes_cold"] = await bench_pool_from_changes(harness, warm=False)
+                    results["pool_from_changes_warm"] = await bench_pool_from_changes(harness, warm=True)
+                elif name == "sheet_write_failures":
+                    results[name] = await bench_sheet_write_failures(harness)
+                elif name == "parse_arena":
+                    results[name] = await bench_parse_arena(harness)
+                elif name == "pool_store":
+                    results[name], results["pool_store_totals"] = await bench_pool_store(harness)
+        finally:
+            await harness.stop()
+    return results
+
+
+def print_results(results: dict[str, dict[str, float]], baseline: Optional[dict[str, dict[str, float]]] = None):
+    header = f"{'benchmark':<24}{'count':>7}{'errors':>7}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, result in results.items():
+        print(f"{name:<24}{result['count']:>7}{result['errors']:>7}{result['throughput_per_s']:>10}"
+              f"{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}")
+        previous = (baseline or {}).get(name)
+        if previous:
+            changes = []
+            for key in ("throughput_per_s", "p50_ms", "p95_ms", "p99_ms"):
+                if previous.get(key):
+                    changes.append(f"{key} {(result[key] - previous[key]) / previous[key] * 100:+.1f}%")
+            print(f"{'':<24}vs baseline: {', '.join(changes)}")
+
+
+def add_service_arguments(parser: argparse.ArgumentParser):
+    """Latency and error injection for the fake services, shared with replay.py."""
+    parser.add_argument("--sheets-latency", type=float, default=0.05, help="seconds per Sheets request")
+    parser.add_argument("--sheets-error-rate", type=float, default=0.0, help="fraction of Sheets requests that fail")
+    parser.add_argument("--sealeddeck-latency", type=float, default=0.05, help="seconds per sealeddeck.tech request")
+    parser.add_argument("--sealeddeck-error-rate", type=float, default=0.0,
+                        help="fraction of sealeddeck.tech requests that fail")
+    parser.add_argument("--discord-latency", type=float, default=0.02, help="seconds per Discord REST call")
+    parser.add_argument("--discord-error-rate", type=float, default=0.0,
+                        help="fraction of Discord REST calls that fail")
+    parser.add_argument("--sheet-flush-interval", type=float, default=PoolBot.SHEET_FLUSH_INTERVAL,
+                        help="seconds Sheets writes are buffered")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="bench", description="Benchmark PoolBot's hot paths against local fakes.")
+    parser.add_argument("--players", type=int, default=50, help="players in the synthetic league")
+    parser.add_argument("--packs-per-player", type=int, default=3, help="packs tracked per player in track_pack")
+    parser.add_argument("--history-length", type=int, default=20, help="packs in each pool_from_changes history")
+    parser.add_argument("--concurrency", type=int, default=50, help="operations in flight at once")
+    parser.add_argument("--startups", type=int, default=5, help="times the bot's services are started in startup")
+    parser.add_argument("--cube-lines", type=int, default=5000, help="card lines in each parse_arena export")
+    parser.add_argument("--parses", type=int, default=50, help="exports parsed in parse_arena")
+    add_service_arguments(parser)
+    parser.add_argument("--benchmarks", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results from an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmarks(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+    print_results(results, baseline)
+    if args.output:
+        parameters = {key: value for key, value in vars(args).items() if key not in ("output", "baseline")}
+        with open(args.output, "w") as file:
+            json.dump({
+                "commit": git_commit(),
+                "timestamp": datetime.now().isoformat(),
+                "parameters": parameters,
+                "results": results,
+            }, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Replay a recording of the gateway events PoolBot handled against the fake services from bench.py.
+
+Recordings are written by the bot itself when `record_events_path` is set in its config, one file per run. They can
+also be generated with --generate, which writes a synthetic league launch instead. Events are dispatched at their recorded offsets,
+sped up --speed times. The replay reports:
+- how late handlers started (dispatch lag)
+- how long each kind of event took to be handled, counted from when it arrived. For packs this is the queueing
+  delay before tracking picks them up
+- end-to-end pack tracking latency, from the pack being posted to its row being written
+- failed and dropped events
+
+    python replay.py launch.jsonl --speed 10 --output replay_results.json
+    python replay.py --generate launch.jsonl --players 200 --duration 600
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Optional, Union
+
+import bench
+from bench import FakeChannel, FakeEmbed, FakeMessage, FakeUser, Harness
+
+# When the event being handled arrived, so the packs it tracks can be timed from then
+arrival: ContextVar[float] = ContextVar("arrival")
+
+
+def load_recording(path: str) -> list[dict[str, Any]]:
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def event_kind(record: dict[str, Any]) -> str:
+    message = record["message"]
+    if record["event"] == "message_edit":
+        return "edit"
+    if message["author"] == "booster_tutor":
+        return "booster_tutor"
+    if message["channel"] == "dm":
+        return "dm"
+    command = (message["content"] or "").split(None, 1)[0].lower() if message["content"] else ""
+    return command if command in ("!challenge", "!playerchoice", "!addpack") else "command"
+
+
+def generate_recording(path: str, players: int, duration: float, packs_per_player: int, challenges: int):
+    """Write a synthetic league launch: everyone's packs generated over `duration` seconds, plus some LFMs."""
+    records: list[dict[str, Any]] = []
+    next_id = iter(range(1, 10_000_000))
+    organizer = 1
+    for player in range(bench.PLAYER_ID_BASE, bench.PLAYER_ID_BASE + players):
+        for _ in range(packs_per_player):
+            t = random.uniform(0, duration)
+            command_id = next(next_id)
+            records.append({"t": t, "event": "message", "message": {
+                "id": command_id, "channel": "packs", "author": organizer, "content": f"!BNC <@{player}>",
+                "embeds": [], "mentions": [player], "reference": None,
+            }})
+            records.append({"t": t + random.uniform(0.5, 2.0), "event": "message", "message": {
+                "id": next(next_id), "channel": "packs", "author": "booster_tutor", "content": "",
+                "embeds": [{"description": f"```\n{bench.arena_list(bench.random_pack())}\n```", "fields": []}],
+                "mentions": [player], "reference": command_id,
+            }})
+    for _ in range(challenges):
+        seeker, challenger = random.sample(range(bench.PLAYER_ID_BASE, bench.PLAYER_ID_BASE + players), 2)
+        t = random.uniform(0, duration)
+        records.append({"t": t, "event": "message", "message": {
+            "id": next(next_id), "channel": "dm", "author": seeker, "content": "!lfm",
+            "embeds": [], "mentions": [], "reference": None,
+        }})
+        records.append({"t": t + random.uniform(1, 30), "event": "message", "message": {
+            "id": next(next_id), "channel": "lfm", "author": challenger, "content": "!challenge",
+            "embeds": [], "mentions": [], "reference": None,
+        }})
+    records.sort(key=lambda record: record["t"])
+    with open(path, "w") as file:
+        for record in records:
+            record["t"] = round(record["t"], 3)
+            file.write(json.dumps(record) + "\n")
+
+
+def recorded_players(records: list[dict[str, Any]]) -> list[int]:
+    """Every pseudonymous user in the recording, so each gets a Player Database row."""
+    users: set[int] = set()
+    for record in records:
+        for message in (record["message"], record.get("before")):
+            if message is None:
+                continue
+            users.update(user for user in [message["author"], *message["mentions"]] if isinstance(user, int))
+    return sorted(users)
+
+
+class Replay:
+    def __init__(self, harness: Harness, records: list[dict[str, Any]], speed: float):
+        self.harness = harness
+        self.records = records
+        self.speed = speed
+        self.users: dict[Union[int, str], FakeUser] = {player.id: player for player in harness.players}
+        self.users["bot"] = harness.bot_user
+        self.users["booster_tutor"] = harness.booster_tutor
+        self.dm_channels: dict[int, FakeChannel] = {}
+        self.other_channel = FakeChannel(harness.discord, 199, "other", harness.bot_user)
+        self.dispatch_lag: list[float] = []
+        self.handled: dict[str, list[float]] = {}
+        self.failed: dict[str, int] = {}
+        self.dropped: dict[str, int] = {}
+        self.tracked: list[tuple[float, asyncio.Future]] = []
+        self.tracked_at: dict[int, float] = {}
+
+    def user(self, ref: Union[int, str]) -> FakeUser:
+        if ref not in self.users:
+            self.users[ref] = FakeUser(self.harness.discord, ref if isinstance(ref, int) else 0, str(ref))
+        return self.users[ref]
+
+    def channel(self, name: str, author: FakeUser) -> FakeChannel:
+        if name == "dm":
+            if author.id not in self.dm_channels:
+                self.dm_channels[author.id] = FakeChannel(
+                    self.harness.discord, author.id, f"dm-{author.id}", self.harness.bot_user, guild=None
+                )
+            return self.dm_channels[author.id]
+        return self.harness.channels.get(name, self.other_channel)
+
+    def message(self, recorded: dict[str, Any]) -> FakeMessage:
+        author = self.user(recorded["author"])
+        embeds = [
+            FakeEmbed(embed["description"], [SimpleNamespace(name=name, value=value) for name, value in embed["fields"]])
+            for embed in recorded["embeds"]
+        ]
+        return FakeMessage(
+            self.channel(recorded["channel"], author),
+            author,
+            recorded["content"] or "",
+            embeds,
+            recorded["reference"],
+            [self.user(user) for user in recorded["mentions"]],
+            message_id=recorded["id"],
+        )
+
+    def watch_tracking(self):
+        """Time every pack handed to a tracker from the arrival of the event that caused it."""
+        loop = asyncio.get_running_loop()
+        for tracker in (self.harness.bot.pool_tracker, self.harness.bot.second_pool_tracker):
+            if tracker is None:
+                continue
+            track_pack = tracker.track_pack
+
+            async def watched(message: Any, track_pack: Any = track_pack) -> asyncio.Future:
+                done = await track_pack(message)
+                self.tracked.append((arrival.get(loop.time()), done))
+                done.add_done_callback(lambda future: self.tracked_at.setdefault(id(future), loop.time()))
+                return done
+
+            tracker.track_pack = watched
+
+    async def dispatch(self, record: dict[str, Any], message: FakeMessage, before: Optional[FakeMessage], arrived: float):
+        loop = asyncio.get_running_loop()
+        arrival.set(arrived)
+        kind = event_kind(record)
+        self.dispatch_lag.append(loop.time() - arrived)
+        try:
+            if before is not None:
+                await self.harness.bot.on_message_edit(before, message)
+            else:
+                await self.harness.bot.on_message(message)
+        except Exception as e:
+            print(f"replay error — {kind}: {e!r}")
+            self.failed[kind] = self.failed.get(kind, 0) + 1
+            return
+        self.handled.setdefault(kind, []).append(loop.time() - arrived)
+
+    async def run(self, drain_timeout: float) -> dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        self.watch_tracking()
+        tasks: dict[asyncio.Task, str] = {}
+        started = loop.time()
+        for record in self.records:
+            arrives = started + record["t"] / self.speed
+            if arrives > loop.time():
+                await asyncio.sleep(arrives - loop.time())
+            # Messages are posted as they arrive so later references and history see them, as on Discord
+            message = self.message(record["message"])
+            message.channel.post(message)
+            before = self.message(record["before"]) if record["event"] == "message_edit" else None
+            task = asyncio.create_task(self.dispatch(record, message, before, arrives))
+            tasks[task] = event_kind(record)
+
+        _, pending = await asyncio.wait(tasks, timeout=drain_timeout) if tasks else (set(), set())
+        for task in pending:
+            self.dropped[tasks[task]] = self.dropped.get(tasks[task], 0) + 1
+            task.cancel()
+        futures = [done for _, done in self.tracked]
+        _, unfinished = await asyncio.wait(futures, timeout=drain_timeout) if futures else (set(), set())
+        elapsed = loop.time() - started
+
+        results: dict[str, Any] = {"dispatch_lag": bench.summarize(self.dispatch_lag, 0, elapsed)}
+        for kind in sorted(set(tasks.values())):
+            result = bench.summarize(self.handled.get(kind, []), self.failed.get(kind, 0), elapsed)
+            result["dropped"] = self.dropped.get(kind, 0)
+            results[f"handled:{kind}"] = result
+        latencies = [self.tracked_at[id(done)] - arrived for arrived, done in self.tracked if done.done()]
+        failed = sum(1 for _, done in self.tracked if done.done() and not done.result())
+        pack_tracking = bench.summarize(latencies, failed, elapsed)
+        pack_tracking["dropped"] = len(unfinished)
+        results["pack_tracking"] = pack_tracking
+        return results
+
+
+async def run_replay(args: argparse.Namespace) -> dict[str, Any]:
+    random.seed(args.seed)
+    records = load_recording(args.recording)
+    with tempfile.TemporaryDirectory() as workdir:
+        harness = Harness(args, Path(workdir), recorded_players(records))
+        await harness.start()
+        try:
+            return await Replay(harness, records, args.speed).run(args.drain_timeout)
+        finally:
+            await harness.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="replay", description="Replay recorded PoolBot events against local fakes.")
+    parser.add_argument("recording", help="JSONL recording to replay (or to write, with --generate)")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay this many times faster than recorded")
+    parser.add_argument("--drain-timeout", type=float, default=120.0,
+                        help="seconds to wait for outstanding work after the last event before counting it dropped")
+    bench.add_service_arguments(parser)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--generate", action="store_true", help="write a synthetic recording instead of replaying")
+    parser.add_argument("--players", type=int, default=100, help="players in a generated recording")
+    parser.add_argument("--duration", type=float, default=600.0, help="seconds covered by a generated recording")
+    parser.add_argument("--packs-per-player", type=int, default=3, help="packs per player in a generated recording")
+    parser.add_argument("--challenges", type=int, default=20, help="LFM/challenge pairs in a generated recording")
+    args = parser.parse_args()
+
+    if args.generate:
+        random.seed(args.seed)
+        generate_recording(args.recording, args.players, args.duration, args.packs_per_player, args.challenges)
+        return
+
+    results = asyncio.run(run_replay(args))
+    bench.print_results(results)
+    dropped = {name: result["dropped"] for name, result in results.items() if result.get("dropped")}
+    if dropped:
+        print(f"dropped: {dropped}")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({
+                "commit": bench.git_commit(),
+                "timestamp": datetime.now().isoformat(),
+                "recording": args.recording,
+                "speed": args.speed,
+                "results": results,
+            }, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,60 @@ class Config:
 
 	second_spreadsheet_id: Optional[str] = None
 	skip_username: Optional[bool] = None
+	# Booster Tutor's user ID; without it, Booster Tutor is found by name
+	booster_tutor_id: Optional[int] = None
+
+	# Maximum number of Google Sheets requests executing at once
+	sheets_max_workers: Optional[int] = None
+	# Seconds before the Google credentials expire that they're refreshed in the background
+	token_refresh_margin: Optional[float] = None
+	# Seconds Sheets writes are held to be batched together, and how many can wait before being flushed early
+	sheet_flush_interval: Optional[float] = None
+	sheet_flush_max_pending: Optional[int] = None
+	# Maximum number of open connections to sealeddeck.tech
+	sealeddeck_max_connections: Optional[int] = None
+	# Where fetched sealeddeck.tech pools are cached on disk, and how much of it to keep in memory
+	pool_cache_path: Optional[str] = None
+	pool_cache_max_bytes: Optional[int] = None
+	# Where the messages for pending !choosePackA/B choices are remembered
+	pack_options_path: Optional[str] = None
+	# Seconds to wait for Booster Tutor to generate the packs for a !playerchoice
+	booster_response_timeout: Optional[float] = None
+	# DMs per second (on average, and in a burst) and DMs in flight at once for broadcasts
+	broadcast_rate: Optional[float] = None
+	broadcast_burst: Optional[int] = None
+	broadcast_concurrency: Optional[int] = None
+	# Where broadcast progress is journaled so interrupted broadcasts can be resumed
+	broadcast_journal_dir: Optional[str] = None
+	# Maximum number of packs fetched at once when rebuilding a pool from its change history
+	sealeddeck_fetch_concurrency: Optional[int] = None
+	# Seconds between full re-reads of the Pool Changes log
+	pool_id_reconcile_interval: Optional[float] = None
+	# Seconds a cached copy of the Player Database is used before it is read again
+	player_directory_ttl: Optional[float] = None
+	# Seconds a cached copy of the Pools tab is used before it is read again
+	pools_index_ttl: Optional[float] = None
+	# Maximum number of players whose packs are tracked at the same time
+	pool_tracker_concurrency: Optional[int] = None
+	# Worker tasks per pack tracking stage (owner, pool, sealeddeck, write), and room in each stage's queue
+	pack_pipeline_workers: Optional[dict[str, int]] = None
+	pack_pipeline_queue_size: Optional[int] = None
+	# Where packs that failed to be tracked are queued to be retried, how many times each is retried before its cell
+	# is marked red, and how many retries are started per second
+	retry_queue_path: Optional[str] = None
+	retry_max_attempts: Optional[int] = None
+	retry_drain_rate: Optional[float] = None
+	# Where each player's pool is kept locally for !pool, and how many changes are folded in between snapshots
+	pool_store_path: Optional[str] = None
+	pool_store_snapshot_every: Optional[int] = None
+	# How !challenge picks among waiting LFMs ("oldest" or "closest" hero score), and seconds before an LFM expires
+	lfm_pairing: Optional[str] = None
+	lfm_timeout: Optional[float] = None
+	# Where to write anonymized copies of the events PoolBot handles, for replay.py. Each run writes its own file, with
+	# the time it started and its process ID added to the name.
+	record_events_path: Optional[str] = None
+	# Local port to serve metrics on in Prometheus' text format; off unless set
+	metrics_port: Optional[int] = None
 
 
 def get_config(path: Path = Path("config.yaml")) -> Config: